@@ -0,0 +1,142 @@
+"""Generate synthetic input .bib files for the benchmarks.
+
+Every entry is one of the following kinds, mixed in the proportions given by --mix:
+  hits       arXiv-style entries whose title is in the bib data (converted by rebiber)
+  arxiv      preprints with an arXiv ID whose title is not in the bib data
+  unknown    entries without arXiv ID whose title is not in the bib data
+  malformed  entries with unbalanced braces or missing commas
+  duplicates verbatim copies of an earlier entry (same key)
+  strings    @string declarations and % comments, plus an entry using a @string macro
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rebiber.bib_index import bib_list_files  # noqa: E402
+from rebiber.fuzzy_index import entry_title  # noqa: E402
+
+filepath = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rebiber") + "/"
+
+DEFAULT_MIX = {"hits": 0.5, "arxiv": 0.2, "unknown": 0.15, "malformed": 0.05, "duplicates": 0.05, "strings": 0.05}
+
+WORDS = ("learning neural networks graph attention language models efficient robust adversarial training "
+         "representation transfer generative reasoning retrieval sparse optimization inference scalable "
+         "unsupervised semantic parsing translation vision detection segmentation reinforcement policy "
+         "bayesian causal kernel embedding contrastive federated benchmark dataset evaluation").split()
+SURNAMES = "Smith Chen Wang Garcia Müller Kim Rossi Nguyen Ivanov Tanaka Dubois Singh".split()
+GIVEN_NAMES = "Alice Bob Carla David Eva Felix Grace Hiro Ines Jun Karl Lena".split()
+
+
+def parse_mix(mix_str):
+    mix = dict(DEFAULT_MIX)
+    if mix_str:
+        mix = {kind: 0.0 for kind in DEFAULT_MIX}
+        for item in mix_str.split(","):
+            kind, share = item.split("=")
+            if kind not in DEFAULT_MIX:
+                raise ValueError(f"Unknown kind of entry: {kind} (expected one of {', '.join(DEFAULT_MIX)})")
+            mix[kind] = float(share)
+    return mix
+
+
+def load_corpus_titles(bib_list_file, start_dir=filepath, max_files=None):
+    titles = []
+    for filename in bib_list_files(bib_list_file, start_dir)[:max_files]:
+        with open(filename) as f:
+            for lines in json.load(f).values():
+                title = entry_title(lines)
+                if title:
+                    titles.append(title)
+    return titles
+
+
+def _authors(rng):
+    return " and ".join(f"{rng.choice(SURNAMES)}, {rng.choice(GIVEN_NAMES)}" for _ in range(rng.randint(1, 5)))
+
+
+def _random_title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 10))).capitalize()
+
+
+def _arxiv_id(rng):
+    return "%02d%02d.%05d" % (rng.randint(15, 23), rng.randint(1, 12), rng.randint(0, 99999))
+
+
+def _entry(key, fields, entry_type="article"):
+    return "@%s{%s,\n%s\n}\n" % (entry_type, key, ",\n".join(f"  {name}={value}" for name, value in fields))
+
+
+def generate_bib(corpus_titles, num_entries, mix=None, seed=0):
+    """Return the text of a synthetic bib file with num_entries entries."""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = [kind for kind in mix if mix[kind] > 0]
+    weights = [mix[kind] for kind in kinds]
+    entries = []
+    for i in range(num_entries):
+        kind = rng.choices(kinds, weights)[0]
+        key = f"{kind}{i}"
+        year = str(rng.randint(2015, 2023))
+        if kind == "duplicates" and entries:
+            entries.append(rng.choice(entries))
+            continue
+        if kind == "hits" and corpus_titles:
+            arxiv_id = _arxiv_id(rng)
+            fields = [("title", "{%s}" % rng.choice(corpus_titles)), ("author", "{%s}" % _authors(rng)),
+                      ("journal", "{arXiv preprint arXiv:%s}" % arxiv_id), ("year", "{%s}" % year)]
+            if rng.random() < 0.3:
+                fields.append(("month", rng.choice(["jan", "jun", "dec"])))
+            entries.append(_entry(key, fields))
+        elif kind == "arxiv":
+            arxiv_id = _arxiv_id(rng)
+            fields = [("title", "{%s}" % _random_title(rng)), ("author", "{%s}" % _authors(rng)),
+                      ("journal", "{CoRR}"), ("volume", "{abs/%s}" % arxiv_id),
+                      ("url", "{https://arxiv.org/abs/%s}" % arxiv_id), ("year", year)]
+            entries.append(_entry(key, fields))
+        elif kind == "malformed":
+            if rng.random() < 0.5:
+                entries.append("@article{%s,\n  title={%s,\n  author={%s},\n  year={%s}\n}\n"
+                               % (key, _random_title(rng), _authors(rng), year))
+            else:
+                entries.append("@inproceedings{%s,\n  title={%s}\n  author={%s}\n  year=%s\n}\n"
+                               % (key, _random_title(rng), _authors(rng), year))
+        elif kind == "strings":
+            entries.append("%% %s\n@string{venue%d = \"Proceedings of the %s Workshop\"}\n"
+                           % (_random_title(rng), i, rng.choice(WORDS).capitalize())
+                           + _entry(key, [("title", "{%s}" % _random_title(rng)), ("author", "{%s}" % _authors(rng)),
+                                          ("booktitle", "venue%d" % i), ("year", "{%s}" % year)],
+                                    "inproceedings"))
+        else:
+            fields = [("title", "{%s}" % _random_title(rng)), ("author", "{%s}" % _authors(rng)),
+                      ("booktitle", "{Proceedings of the %s Conference}" % rng.choice(WORDS).capitalize()),
+                      ("pages", "{%d--%d}" % (i, i + 10)), ("year", "{%s}" % year)]
+            entries.append(_entry(key, fields, "inproceedings"))
+    return "\n".join(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic input .bib file for the benchmarks.")
+    parser.add_argument("-n", "--num_entries", default=1000,
+                        type=int, help="The number of entries.")
+    parser.add_argument("-o", "--output_bib", required=True,
+                        type=str, help="The output bib file.")
+    parser.add_argument("-l", "--bib_list", default=filepath+"bib_list.txt",
+                        type=str, help="The list of bib data to draw the titles of the hits from.")
+    parser.add_argument("-m", "--mix", default="",
+                        type=str, help="Shares of the kinds of entries, e.g. 'hits=0.5,arxiv=0.3,malformed=0.2' "
+                                       "(default: %s)." % ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument("--seed", default=0,
+                        type=int, help="The random seed.")
+    args = parser.parse_args()
+    corpus_titles = load_corpus_titles(args.bib_list)
+    with open(args.output_bib, "w", encoding="utf8") as f:
+        f.write(generate_bib(corpus_titles, args.num_entries, parse_mix(args.mix), args.seed))
+    print("Written to:", args.output_bib)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Time each stage of rebiber on synthetic inputs and save the results as JSON.
+
+Stages: construct_bib_db (once), then for every input size load_bib_file,
+load_bib_records, matching (match_bib_entries) and post_processing plus writing.
+Wall times are the best of --repeat runs; peak memory is measured with
+tracemalloc in a separate run, so that tracing does not distort the times.
+
+    python benchmarks/run_benchmarks.py -n 100 1000 10000 -o results.json
+    python benchmarks/run_benchmarks.py -n 1000 --compare results.json
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rebiber  # noqa: E402
+from rebiber.bib2json import load_bib_file, load_bib_records  # noqa: E402
+from rebiber.normalize import construct_bib_db, load_abbr_tsv, match_bib_entries, post_processing  # noqa: E402
+
+from generate_bib import filepath, generate_bib, load_corpus_titles, parse_mix  # noqa: E402
+
+
+def measure(fn, repeat=1, memory=True):
+    """Return (result, best wall time in seconds, peak traced memory in MB or None)."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            result = fn()
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    peak_mb = None
+    if memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            result = fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, best, peak_mb
+
+
+def _stage(seconds, peak_mb):
+    return {"seconds": round(seconds, 6), "peak_mb": None if peak_mb is None else round(peak_mb, 3)}
+
+
+def run(bib_list_file, sizes, mix, db_mode="json", shorten=False, repeat=3, memory=True, seed=0, work_dir=None):
+    kwargs = {"json": dict(use_index=False, use_cache=False), "cache": dict(use_index=False),
+              "index": dict(use_cache=False), "lazy": dict(lazy=True, use_cache=False)}[db_mode]
+    bib_db, seconds, peak_mb = measure(lambda: construct_bib_db(bib_list_file, start_dir=filepath, **kwargs),
+                                       repeat=1, memory=memory)
+    results = {
+        "rebiber_version": rebiber.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "bib_list": os.path.abspath(bib_list_file),
+        "db_mode": db_mode,
+        "db_size": len(bib_db),
+        "mix": mix,
+        "shorten": shorten,
+        "construct_bib_db": _stage(seconds, peak_mb),
+        "sizes": [],
+    }
+    corpus_titles = load_corpus_titles(bib_list_file)
+    abbr_dict = load_abbr_tsv(filepath + "abbr.tsv") if shorten else []
+    work_dir = work_dir or tempfile.mkdtemp(prefix="rebiber-bench-")
+    for num_entries in sizes:
+        input_path = os.path.join(work_dir, f"input_{num_entries}.bib")
+        output_path = os.path.join(work_dir, f"output_{num_entries}.bib")
+        with open(input_path, "w", encoding="utf8") as f:
+            f.write(generate_bib(corpus_titles, num_entries, mix, seed))
+        stages = {}
+        _, seconds, peak_mb = measure(lambda: load_bib_file(input_path), repeat, memory)
+        stages["load_bib_file"] = _stage(seconds, peak_mb)
+        records, seconds, peak_mb = measure(lambda: load_bib_records(input_path), repeat, memory)
+        stages["load_bib_records"] = _stage(seconds, peak_mb)
+        (output_bib_entries, num_converted), seconds, peak_mb = measure(
+            lambda: match_bib_entries(bib_db, records), repeat, memory)
+        stages["matching"] = _stage(seconds, peak_mb)
+
+        def post_process_and_write():
+            output_string = post_processing(output_bib_entries, [""], abbr_dict, False)
+            with open(output_path, "w", encoding="utf8") as f:
+                f.write(output_string)
+
+        _, seconds, peak_mb = measure(post_process_and_write, repeat, memory)
+        stages["post_processing"] = _stage(seconds, peak_mb)
+        results["sizes"].append({"num_entries": num_entries, "num_records": len(records),
+                                 "num_converted": num_converted, "stages": stages})
+        print("Entries: %d ; Converted: %d ; %s" % (num_entries, num_converted, " ; ".join(
+            "%s: %.3fs" % (name, stage["seconds"]) for name, stage in stages.items())))
+    return results
+
+
+def compare(results, baseline):
+    """Print the change of every stage relative to the baseline results."""
+    def rows(res):
+        yield "construct_bib_db", res["construct_bib_db"]
+        for size in res["sizes"]:
+            for name, stage in size["stages"].items():
+                yield f"{name}@{size['num_entries']}", stage
+
+    baseline_rows = dict(rows(baseline))
+    print("%-28s %12s %12s %8s %10s %10s" % ("stage", "base (s)", "now (s)", "change", "base (MB)", "now (MB)"))
+    for name, stage in rows(results):
+        base = baseline_rows.get(name)
+        if base is None:
+            continue
+        change = (stage["seconds"] / base["seconds"] - 1) * 100 if base["seconds"] else 0.0
+        print("%-28s %12.4f %12.4f %+7.1f%% %10s %10s" % (name, base["seconds"], stage["seconds"], change,
+                                                        base.get("peak_mb"), stage.get("peak_mb")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stages of rebiber on synthetic bib files.")
+    parser.add_argument("-n", "--sizes", nargs="+", default=[100, 1000, 10000],
+                        type=int, help="The numbers of entries of the synthetic inputs (100 to 100000).")
+    parser.add_argument("-l", "--bib_list", default=filepath+"bib_list.txt",
+                        type=str, help="The list of candidate bib data.")
+    parser.add_argument("-m", "--mix", default="",
+                        type=str, help="Shares of the kinds of entries, see generate_bib.py.")
+    parser.add_argument("--db_mode", default="json", choices=["json", "cache", "index", "lazy"],
+                        help="How construct_bib_db loads the data: from the json files, the pickle cache, "
+                             "the compiled index, or lazily.")
+    parser.add_argument("-s", "--shorten", action="store_true",
+                        help="Shorten the venue names in post_processing.")
+    parser.add_argument("-r", "--repeat", default=3,
+                        type=int, help="Report the best wall time of this many runs.")
+    parser.add_argument("--no_memory", action="store_true",
+                        help="Do not measure the peak memory with tracemalloc (saves one run per stage).")
+    parser.add_argument("--seed", default=0,
+                        type=int, help="The random seed of the synthetic inputs.")
+    parser.add_argument("-o", "--output_json", default=None,
+                        type=str, help="Save the results to this file.")
+    parser.add_argument("-c", "--compare", default=None,
+                        type=str, help="A results file of an earlier run to compare with.")
+    args = parser.parse_args()
+
+    results = run(args.bib_list, args.sizes, parse_mix(args.mix), args.db_mode, args.shorten, args.repeat,
+                  not args.no_memory, args.seed)
+    if args.output_json:
+        with open(args.output_json, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Written to:", args.output_json)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
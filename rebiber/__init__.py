@@ -2,14 +2,22 @@
 Rebiber: A tool for normalizing bibtex with official info.
 """
 
-from rebiber.bib2json import load_bib_file
-from rebiber.normalize import construct_bib_db, normalize_bib
+from rebiber.bib2json import load_bib_file, load_bib_records, iter_bib_records, BibRecord
+from rebiber.bib_database import BibDatabase
+from rebiber.normalize import construct_bib_db, normalize_bib, EntryResult
+from rebiber.normalizer import Normalizer
 
 __version__ = "1.1.3"
 
 __all__ = [
     "__version__",
     "load_bib_file",
+    "load_bib_records",
+    "iter_bib_records",
+    "BibRecord",
+    "BibDatabase",
     "construct_bib_db",
-    "normalize_bib"
+    "normalize_bib",
+    "Normalizer",
+    "EntryResult"
 ]
\ No newline at end of file
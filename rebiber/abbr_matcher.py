@@ -0,0 +1,53 @@
+import re
+from typing import Dict, Iterable, Iterator, Tuple
+
+
+class AbbrMatcher:
+    """Shortens venue names with the (short, pattern) pairs of an abbr.tsv file.
+
+    The result is the same as trying ``re.match(pattern, venue)`` for every
+    pair in order and replacing the venue on each match, but the patterns are
+    compiled once into a single alternation that finds the first matching
+    pair, and the result for each distinct venue is remembered.
+    Iterating over the matcher yields the (short, pattern) pairs.
+    """
+
+    def __init__(self, abbr_pairs: Iterable[Tuple[str, str]]):
+        self.abbr_pairs = list(abbr_pairs)
+        self._patterns = [re.compile(pattern) for _, pattern in self.abbr_pairs]
+        self._combined = None
+        # patterns with their own groups could contain backreferences, which
+        # would be renumbered in the alternation
+        if self._patterns and not any(pattern.groups for pattern in self._patterns):
+            try:
+                self._combined = re.compile("|".join(f"(?P<p{i}>{pattern})"
+                                                     for i, (_, pattern) in enumerate(self.abbr_pairs)))
+            except re.error:
+                self._combined = None
+        self._shortened: Dict[str, str] = {}
+
+    def _first_match(self, venue: str) -> int:
+        if self._combined is None:
+            return next((i for i, pattern in enumerate(self._patterns) if pattern.match(venue)), -1)
+        m = self._combined.match(venue)
+        return int(m.lastgroup[1:]) if m is not None else -1
+
+    def shorten(self, venue: str) -> str:
+        shortened = self._shortened.get(venue)
+        if shortened is None:
+            shortened = venue
+            first = self._first_match(venue)
+            if first >= 0:
+                shortened = self.abbr_pairs[first][0]
+                # the later pairs are tried on the short name, as before
+                for i in range(first + 1, len(self._patterns)):
+                    if self._patterns[i].match(shortened):
+                        shortened = self.abbr_pairs[i][0]
+            self._shortened[venue] = shortened
+        return shortened
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return iter(self.abbr_pairs)
+
+    def __len__(self) -> int:
+        return len(self.abbr_pairs)
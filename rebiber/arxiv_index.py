@@ -0,0 +1,43 @@
+import json
+import os
+import re
+from typing import Dict
+
+from rebiber.bib2json import find_arxiv_ids
+
+# DBLP exports the arXiv ID of an entry as "eprint = {2010.12345}" next to "archivePrefix = {arXiv}"
+_EPRINT = re.compile(r"eprint\s*=\s*[{\"]\s*(?:arxiv:)?([0-9]{4}\.[0-9]{5})", re.I)
+_PREPRINT_VENUE = re.compile(r"journal\s*=\s*[{\"]\s*\{?\s*(corr|arxiv)\b", re.I)
+
+
+def arxiv_index_path_for(bib_list_file):
+    return os.path.splitext(bib_list_file)[0] + ".arxiv.json"
+
+
+def build_arxiv_index(bib_db) -> Dict[str, str]:
+    """Map the arXiv IDs in the ee/url/eprint fields of the corpus to the (normalized title) key of the entry.
+
+    Preprints (CoRR) are skipped, so that every ID resolves to its published version.
+    """
+    arxiv_index = {}
+    for key, lines in bib_db.items():
+        text = "".join(lines)
+        if "arxiv" not in text.lower() and "eprint" not in text.lower():
+            continue
+        if _PREPRINT_VENUE.search(text):
+            continue
+        for arxiv_id in find_arxiv_ids(text) + _EPRINT.findall(text):
+            arxiv_index[arxiv_id] = key
+    return arxiv_index
+
+
+def write_arxiv_index(arxiv_index, index_path) -> None:
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(arxiv_index, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+
+def read_arxiv_index(index_path) -> Dict[str, str]:
+    with open(index_path) as f:
+        return json.load(f)
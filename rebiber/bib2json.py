@@ -5,6 +5,7 @@ import bibtexparser
 import argparse
 from tqdm import tqdm
 import os
+from typing import Dict, FrozenSet, Iterator, List, NamedTuple, Optional
 
 
 filepath = os.path.dirname(os.path.abspath(__file__)) + '/'
@@ -15,6 +16,14 @@ def normalize_title(title_str):
     return title_str.lower().replace(" ", "").strip()
 
 
+ARXIV_ID = re.compile(r"(arxiv:|arxiv.org\/abs\/|arxiv.org\/pdf\/)([0-9]{4}).([0-9]{5})")
+
+
+def find_arxiv_ids(text):
+    """All arXiv IDs (yymm.nnnnn, without version) referenced in a bib entry."""
+    return [f"{m.group(2)}.{m.group(3)}" for m in ARXIV_ID.finditer(text.lower())]
+
+
 def load_bib_file(bibpath):
     all_bib_entries = []
     with open(bibpath, encoding='utf8') as f:
@@ -57,10 +66,293 @@ def load_bib_file(bibpath):
     return all_bib_entries
 
 
-def build_json(all_bib_entries):
+class BibRecord(NamedTuple):
+    raw: str
+    key: Optional[str]
+    type: str
+    # None if the entry is malformed; otherwise field names are lowercased and
+    # values are cleaned the same way bibtexparser does
+    fields: Optional[Dict[str, str]]
+    # fields whose value is only a @string or month macro (e.g., `booktitle = emnlp`)
+    macro_fields: FrozenSet[str] = frozenset()
+
+
+COMMON_STRINGS = {
+    "jan": "January", "feb": "February", "mar": "March", "apr": "April",
+    "may": "May", "jun": "June", "jul": "July", "aug": "August",
+    "sep": "September", "oct": "October", "nov": "November", "dec": "December",
+}
+
+_WS = re.compile(r"[ \t\r\n]*")
+_ENTRY_START = re.compile(r"@[ \t\r\n]*([A-Za-z]+)[ \t\r\n]*([{(]?)")
+_NEXT_ENTRY = re.compile(r"\n[ \t\r\n]*@")
+_FIELD_NAME = re.compile(r"([A-Za-z0-9_\-().+]+)[ \t\r\n]*=[ \t\r\n]*")
+_INTEGER = re.compile(r"[0-9]+")
+_STRING_NAME = re.compile(r"[A-Za-z0-9_\-:]+")
+_BRACES = re.compile(r"[{}]")
+_QUOTED_STOP = re.compile(r'["{}]')
+
+
+class _NeedMoreInput(Exception):
+    pass
+
+
+class _Malformed(Exception):
+    pass
+
+
+def _strip_after_new_lines(value):
+    lines = value.splitlines()
+    if len(lines) > 1:
+        lines = [lines[0]] + [line.lstrip() for line in lines[1:]]
+    return "\n".join(lines)
+
+
+def _expand_tabs(text, start, end):
+    # bibtexparser expands tabs over the whole input, so tab stops depend on the column
+    value = text[start:end]
+    if "\t" not in value:
+        return value
+    column = len(text[text.rfind("\n", 0, start) + 1:start].expandtabs())
+    return (" " * column + value).expandtabs()[column:]
+
+
+def _skip_braces(text, pos):
+    # text[pos] == "{"; returns the position after the matching "}"
+    close = text.find("}", pos + 1)
+    if close >= 0 and text.find("{", pos + 1, close) < 0:
+        return close + 1
+    depth = 0
+    for m in _BRACES.finditer(text, pos):
+        depth += 1 if m.group() == "{" else -1
+        if depth == 0:
+            return m.end()
+    raise _Malformed()
+
+
+def _skip_quoted(text, pos):
+    # text[pos] == '"'; returns the position after the closing quote
+    pos += 1
+    while True:
+        m = _QUOTED_STOP.search(text, pos)
+        if m is None or m.group() == "}":
+            raise _Malformed()
+        if m.group() == '"':
+            return m.end()
+        pos = _skip_braces(text, m.start())
+
+
+def _parse_value(text, pos, strings):
+    """Parse a field value at ``pos``; returns (value, is_macro, end position).
+
+    With ``strings`` None, macros and ``#`` concatenation are rejected as malformed.
+    """
+    m = _INTEGER.match(text, pos)
+    if m:
+        return m.group(), False, _WS.match(text, m.end()).end()
+    parts = []
+    is_macro = True
+    while True:
+        if pos >= len(text):
+            raise _Malformed()
+        if text[pos] in '"{':
+            end = _skip_braces(text, pos) if text[pos] == "{" else _skip_quoted(text, pos)
+            parts.append(_strip_after_new_lines(_expand_tabs(text, pos + 1, end - 1)))
+            is_macro = False
+        else:
+            m = _STRING_NAME.match(text, pos)
+            if m is None or strings is None:
+                raise _Malformed()
+            end = m.end()
+            parts.append(strings.get(m.group().lower(), m.group()))
+        pos = _WS.match(text, end).end()
+        if not text.startswith("#", pos):
+            break
+        if strings is None:
+            raise _Malformed()
+        pos = _WS.match(text, pos + 1).end()
+    value = "".join(parts)
+    return ("" if value == "{}" else value), is_macro, pos
+
+
+def _parse_declaration(text, pos, entry_type, closing, strings):
+    pos = _WS.match(text, pos).end()
+    name = None
+    if entry_type == "string":
+        m = _STRING_NAME.match(text, pos)
+        if m is None:
+            raise _Malformed()
+        name = m.group().lower()
+        pos = _WS.match(text, m.end()).end()
+        if not text.startswith("=", pos):
+            raise _Malformed()
+        pos = _WS.match(text, pos + 1).end()
+    value, _, pos = _parse_value(text, pos, strings)
+    if not text.startswith(closing, pos):
+        raise _Malformed()
+    if name is not None:
+        strings[name] = value
+    return pos + 1
+
+
+def _parse_entry(text, start, strings, eof=True):
+    """Parse the entry, @string, @preamble or @comment at ``text[start] == "@"``.
+
+    Returns (end position, record or None). Raises _Malformed if the text at
+    ``start`` does not follow the BibTeX grammar accepted by bibtexparser. With
+    ``strings`` None, repeated field names are rejected as well (see parse_entry).
+    """
+    m = _ENTRY_START.match(text, start)
+    if m is None:
+        raise _Malformed()
+    entry_type = m.group(1).lower()
+    if entry_type == "comment":
+        m = _NEXT_ENTRY.search(text, m.end())
+        if m is None and not eof:
+            raise _NeedMoreInput()
+        return (m.end() - 1 if m else len(text)), None
+    if not m.group(2):
+        raise _Malformed()
+    closing = "}" if m.group(2) == "{" else ")"
+    pos = m.end()
+    if entry_type in ("string", "preamble"):
+        try:
+            return _parse_declaration(text, pos, entry_type, closing, strings), None
+        except _Malformed:
+            pass  # bibtexparser then tries to read it as a regular entry
+
+    comma = text.find(",", pos)
+    if comma < 0:
+        raise _Malformed()
+    key = text[pos:comma].strip()
+    if len(key.split()) != 1:
+        raise _Malformed()
+    pos = _WS.match(text, comma + 1).end()
+
+    fields = {}
+    macro_fields = set()
+    while True:
+        m = _FIELD_NAME.match(text, pos)
+        if m is None:
+            # the field list needs at least one field, and may end with a comma
+            if fields and text.startswith(closing, pos):
+                break
+            raise _Malformed()
+        name = m.group(1).lower()
+        value, is_macro, pos = _parse_value(text, m.end(), strings)
+        if name not in fields:
+            fields[name] = value
+            if is_macro:
+                macro_fields.add(name)
+        elif strings is None:
+            raise _Malformed()
+        if text.startswith(",", pos):
+            pos = _WS.match(text, pos + 1).end()
+        elif text.startswith(closing, pos):
+            break
+        else:
+            raise _Malformed()
+    end = pos + 1
+    return end, BibRecord(text[start:end], key, entry_type, fields, frozenset(macro_fields))
+
+
+def _entry_is_buffered(text, start):
+    # An entry can only be parsed once the text up to its closing delimiter
+    # (or up to the next entry for unbalanced input) has been read.
+    m = _ENTRY_START.match(text, start)
+    if m is None or m.group(1).lower() == "comment" or m.group(2) != "{":
+        return _NEXT_ENTRY.search(text, start) is not None
+    depth = 0
+    for brace in _BRACES.finditer(text, m.end() - 1):
+        depth += 1 if brace.group() == "{" else -1
+        if depth == 0:
+            return True
+    return False
+
+
+def parse_entry(text) -> Optional[BibRecord]:
+    """Parse text that holds exactly one regular entry and nothing but whitespace around it.
+
+    Returns None unless bibtexparser is known to read the text as that single
+    entry with the same fields: @string/@preamble/@comment blocks, macros,
+    ``#`` concatenation and repeated field names are all left to bibtexparser.
+    """
+    start = _WS.match(text).end()
+    m = _ENTRY_START.match(text, start)
+    if m is None or m.group(1).lower() in ("string", "preamble", "comment"):
+        return None
+    try:
+        end, record = _parse_entry(text, start, None)
+    except _Malformed:
+        return None
+    if _WS.match(text, end).end() != len(text):
+        return None
+    return record
+
+
+def iter_bib_records(source, chunk_size=1 << 16) -> Iterator[BibRecord]:
+    """Stream the entries of a BibTeX file object (or string) as BibRecords.
+
+    The input is tokenized in a single brace-aware pass and read in chunks,
+    so entries are yielded as soon as they are complete. Comments, @string,
+    @preamble and @comment blocks are consumed but not yielded; @string
+    definitions (and the month abbreviations) are expanded in later values.
+    Malformed entries are yielded with ``fields`` set to None.
+    """
+    if isinstance(source, str):
+        text, eof = source, True
+    else:
+        text, eof = source.read(chunk_size), False
+    text = text.lstrip("\ufeff")
+    strings = dict(COMMON_STRINGS)
+    pos = 0
+    while True:
+        try:
+            pos = _WS.match(text, pos).end()
+            if pos >= len(text):
+                if eof:
+                    return
+                raise _NeedMoreInput()
+            if not text.startswith("@", pos):
+                # implicit comment: everything up to the next line starting with @
+                m = _NEXT_ENTRY.search(text, pos)
+                if m is None:
+                    if eof:
+                        return
+                    raise _NeedMoreInput()
+                pos = m.end() - 1
+                continue
+            try:
+                pos, record = _parse_entry(text, pos, strings, eof)
+            except _Malformed:
+                if not eof and not _entry_is_buffered(text, pos):
+                    raise _NeedMoreInput()
+                m = _NEXT_ENTRY.search(text, pos)
+                if m is None and not eof:
+                    raise _NeedMoreInput()
+                end = m.end() - 1 if m else len(text)
+                m = _ENTRY_START.match(text, pos)
+                entry_type = m.group(1).lower() if m else ""
+                record = BibRecord(text[pos:end].rstrip(), None, entry_type, None)
+                pos = end
+            if record is not None:
+                yield record
+        except _NeedMoreInput:
+            chunk = source.read(max(chunk_size, len(text) - pos))
+            text = text[pos:] + chunk
+            pos = 0
+            eof = not chunk
+
+
+def load_bib_records(bibpath) -> List[BibRecord]:
+    with open(bibpath, encoding='utf8') as f:
+        return list(iter_bib_records(f))
+
+
+def build_json(all_bib_entries, progress=True):
     all_bib_dict = {}
     num_expections = 0
-    for bib_entry in tqdm(all_bib_entries[:]):
+    for bib_entry in tqdm(all_bib_entries[:], disable=not progress):
         bib_entry_str = " ".join([line for line in bib_entry if "month" not in line.lower()]).lower()
         try:
             bib_entry_parsed = bibtexparser.loads(bib_entry_str)
@@ -0,0 +1,175 @@
+import bisect
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Iterable, List, Optional
+
+from rebiber.bib_index import bib_list_files, is_index_fresh
+from rebiber.db_cache import cached_index_path_for
+from rebiber.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Layout of a shard map file:
+#   header: magic, format version, number of keys
+#   body:   uint32 key hashes (sorted), followed by the uint16 shard id of each hash
+MAGIC = b"RBSHRD\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIQ")
+
+
+def shard_map_path_for(bib_list_file):
+    return os.path.splitext(bib_list_file)[0] + ".shards"
+
+
+def _hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf8"), digest_size=4).digest(), "little")
+
+
+def build_shard_map(bib_list_file, start_dir=""):
+    pairs = []
+    for shard_id, filename in enumerate(bib_list_files(bib_list_file, start_dir)):
+        with open(filename) as f:
+            pairs.extend((_hash_key(key), shard_id) for key in json.load(f))
+    pairs.sort()
+    hashes = array("I", [h for h, _ in pairs])
+    shard_ids = array("H", [s for _, s in pairs])
+    return hashes, shard_ids
+
+
+def write_shard_map(hashes, shard_ids, shard_map_path):
+    tmp_path = shard_map_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(hashes)))
+        f.write(hashes.tobytes())
+        f.write(shard_ids.tobytes())
+    os.replace(tmp_path, shard_map_path)
+
+
+def read_shard_map(shard_map_path):
+    with open(shard_map_path, "rb") as f:
+        magic, version, size = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{shard_map_path} is not a rebiber shard map (version {VERSION}).")
+        hashes = array("I")
+        hashes.frombytes(f.read(size * hashes.itemsize))
+        shard_ids = array("H")
+        shard_ids.frombytes(f.read(size * shard_ids.itemsize))
+    return hashes, shard_ids
+
+
+class BibDatabase:
+    """Lazily loaded bib database that can stand in for the dict from ``construct_bib_db``.
+
+    A small map from key hashes to the ``data/*.json`` file (shard) containing
+    each key decides which shards to read; a shard is only deserialized the
+    first time one of its titles is requested, and at most
+    ``max_resident_shards`` shards are kept in memory. ``prefetch`` reads the
+    titles of a whole input shard by shard, so each shard is loaded once.
+    """
+
+    def __init__(self, bib_list_file, start_dir="", max_resident_shards=32):
+        self.shard_files = bib_list_files(bib_list_file, start_dir)
+        self.max_resident_shards = max_resident_shards
+        self._shards = OrderedDict()
+        self.num_shard_loads = 0
+        self._prefetched = {}
+        self._lock = threading.Lock()
+
+        shard_map_path = shard_map_path_for(bib_list_file)
+        cached_shard_map_path = cached_index_path_for(bib_list_file, ".shards")
+        if is_index_fresh(shard_map_path, bib_list_file, start_dir):
+            self._hashes, self._shard_ids = read_shard_map(shard_map_path)
+        elif is_index_fresh(cached_shard_map_path, bib_list_file, start_dir):
+            self._hashes, self._shard_ids = read_shard_map(cached_shard_map_path)
+        else:
+            self._hashes, self._shard_ids = build_shard_map(bib_list_file, start_dir)
+            try:
+                write_shard_map(self._hashes, self._shard_ids, shard_map_path)
+            except OSError as e:
+                logger.warning("Could not write shard map: %s", e)
+                shard_map_path = cached_shard_map_path
+                try:
+                    os.makedirs(os.path.dirname(shard_map_path), exist_ok=True)
+                    write_shard_map(self._hashes, self._shard_ids, shard_map_path)
+                except OSError as e:
+                    logger.warning("Could not write shard map: %s", e)
+                    return
+            logger.info("Built shard map: %s", shard_map_path)
+
+    def _load_shard(self, shard_id):
+        with self._lock:
+            return self._load_shard_locked(shard_id)
+
+    def _load_shard_locked(self, shard_id):
+        if shard_id in self._shards:
+            self._shards.move_to_end(shard_id)
+            return self._shards[shard_id]
+        with open(self.shard_files[shard_id]) as f:
+            shard = json.load(f)
+        logger.info("Loaded: %s Size: %d", f.name, len(shard))
+        self.num_shard_loads += 1
+        metrics.count("shard_loads")
+        self._shards[shard_id] = shard
+        if len(self._shards) > self.max_resident_shards:
+            self._shards.popitem(last=False)
+        return shard
+
+    def _candidate_shards(self, key: str) -> List[int]:
+        h = _hash_key(key)
+        i = bisect.bisect_left(self._hashes, h)
+        candidates = []
+        while i < len(self._hashes) and self._hashes[i] == h:
+            candidates.append(self._shard_ids[i])
+            i += 1
+        # later files in the bib list take precedence, as in construct_bib_db
+        return sorted(set(candidates), reverse=True)
+
+    def prefetch(self, keys: Iterable[str]) -> None:
+        """Read the entries of keys (e.g. all titles of an input) now, loading each shard they are in once.
+
+        Replaces the previous prefetch; ``get`` answers these keys without touching the shards.
+        """
+        keys_by_shard = defaultdict(list)
+        for key in set(keys):
+            for shard_id in self._candidate_shards(key):
+                keys_by_shard[shard_id].append(key)
+        prefetched = {}
+        # in increasing order, so that later files in the bib list take precedence
+        for shard_id in sorted(keys_by_shard):
+            shard = self._load_shard(shard_id)
+            for key in keys_by_shard[shard_id]:
+                if key in shard:
+                    prefetched[key] = shard[key]
+        self._prefetched = prefetched
+
+    def get(self, key: str, default=None) -> Optional[List[str]]:
+        lines = self._prefetched.get(key)
+        if lines is not None:
+            return lines
+        for shard_id in self._candidate_shards(key):
+            shard = self._load_shard(shard_id)
+            if key in shard:
+                return shard[key]
+        return default
+
+    def __getitem__(self, key: str) -> List[str]:
+        lines = self.get(key)
+        if lines is None:
+            raise KeyError(key)
+        return lines
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    @property
+    def num_resident_shards(self) -> int:
+        return len(self._shards)
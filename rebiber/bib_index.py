@@ -0,0 +1,125 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Tuple
+
+# Layout of a compiled index file:
+#   header: magic, format version, number of entries, offset of the entry blob
+#   table:  one (key hash, blob offset, blob length) record per entry, sorted by hash
+#   blob:   per entry, the JSON-encoded [normalized title, lines] pair
+MAGIC = b"RBBIDX\x00\x00"
+VERSION = 1
+HEADER = struct.Struct("<8sIQQ")
+RECORD = struct.Struct("<QQI")
+
+
+def index_path_for(bib_list_file):
+    return os.path.splitext(bib_list_file)[0] + ".idx"
+
+
+def bib_list_files(bib_list_file, start_dir=""):
+    with open(bib_list_file) as f:
+        return [start_dir + line.strip() for line in f if line.strip()]
+
+
+def is_index_fresh(index_path, bib_list_file, start_dir=""):
+    if not os.path.exists(index_path):
+        return False
+    index_mtime = os.path.getmtime(index_path)
+    sources = [bib_list_file] + bib_list_files(bib_list_file, start_dir)
+    return all(os.path.getmtime(source) <= index_mtime for source in sources)
+
+
+def hash_key(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf8"), digest_size=8).digest(), "little")
+
+
+def write_bib_index(bib_db: Dict[str, List[str]], index_path: str) -> None:
+    records = []
+    blob = bytearray()
+    for key, lines in bib_db.items():
+        payload = json.dumps([key, lines], separators=(",", ":")).encode("utf8")
+        records.append((hash_key(key), len(blob), len(payload)))
+        blob += payload
+    records.sort()
+
+    blob_offset = HEADER.size + RECORD.size * len(records)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(records), blob_offset))
+        for record in records:
+            f.write(RECORD.pack(*record))
+        f.write(blob)
+    os.replace(tmp_path, index_path)
+
+
+class BibIndex:
+    """Read-only, memory-mapped view of a compiled index.
+
+    Behaves like the dict returned by ``construct_bib_db`` for the operations
+    ``normalize_bib`` needs, but only decodes the entries that are looked up.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._size, self._blob_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{index_path} is not a rebiber index (version {VERSION}).")
+
+    def _hash_at(self, i: int) -> int:
+        return struct.unpack_from("<Q", self._mm, HEADER.size + i * RECORD.size)[0]
+
+    def _entry_at(self, i: int) -> Tuple[str, List[str]]:
+        _, offset, length = RECORD.unpack_from(self._mm, HEADER.size + i * RECORD.size)
+        start = self._blob_offset + offset
+        key, lines = json.loads(self._mm[start:start + length].decode("utf8"))
+        return key, lines
+
+    def _lookup(self, key: str):
+        h = hash_key(key)
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._hash_at(mid) < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        while lo < self._size and self._hash_at(lo) == h:
+            entry_key, lines = self._entry_at(lo)
+            if entry_key == key:
+                return lines
+            lo += 1
+        return None
+
+    def __getitem__(self, key: str) -> List[str]:
+        lines = self._lookup(key)
+        if lines is None:
+            raise KeyError(key)
+        return lines
+
+    def get(self, key: str, default=None):
+        lines = self._lookup(key)
+        return default if lines is None else lines
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._lookup(key) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def items(self) -> Iterator[Tuple[str, List[str]]]:
+        for i in range(self._size):
+            yield self._entry_at(i)
+
+    def keys(self) -> Iterator[str]:
+        for key, _ in self.items():
+            yield key
+
+    __iter__ = keys
+
+    def close(self) -> None:
+        self._mm.close()
@@ -0,0 +1,158 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rebiber.arxiv_index import arxiv_index_path_for, build_arxiv_index, write_arxiv_index
+from rebiber.bib2json import load_bib_file, build_json
+from rebiber.bib_index import bib_list_files
+from rebiber.data_update import file_sha256, write_data_manifest
+
+filepath = os.path.dirname(os.path.abspath(__file__)) + '/'
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".build_manifest.json"
+PARTIAL_FILE = re.compile(r"^(.+)_(\d+)\.bib$")
+
+
+def find_raw_bibs(raw_dir):
+    """Map each conference name (e.g. iclr2020) to its raw .bib file in raw_dir.
+
+    Conferences that were downloaded in batches (iclr2020_1.bib, iclr2020_2.bib, ...)
+    are concatenated into iclr2020.bib first, as add_conf.sh does; once that
+    file exists, the batches are ignored. Names like aaai2018-2.bib are separate
+    files of their own.
+    """
+    raw_bibs = {}
+    partials = {}
+    for path in sorted(glob.glob(os.path.join(raw_dir, "*.bib"))):
+        filename = os.path.basename(path)
+        m = PARTIAL_FILE.match(filename)
+        if m is None:
+            raw_bibs[filename[:-len(".bib")]] = path
+        elif not os.path.exists(os.path.join(raw_dir, m.group(1) + ".bib")):
+            partials.setdefault(m.group(1), []).append((int(m.group(2)), path))
+    for name, parts in partials.items():
+        path = os.path.join(raw_dir, name + ".bib")
+        logger.info("Concatenating: %s -> %s", ", ".join(part for _, part in sorted(parts)), path)
+        with open(path, "wb") as out:
+            for _, part in sorted(parts):
+                with open(part, "rb") as f:
+                    out.write(f.read())
+        raw_bibs[name] = path
+    return raw_bibs
+
+
+def write_atomic(path, text):
+    tmp_path = path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def build_one(raw_path, output_path):
+    all_bib_dict = build_json(load_bib_file(raw_path), progress=False)
+    write_atomic(output_path, json.dumps(all_bib_dict, separators=(",", ":")))
+    return len(all_bib_dict)
+
+
+def update_bib_list(bib_list_file, output_paths):
+    """Append the newly built files to the bib list, keeping the existing order."""
+    with open(bib_list_file) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    base_dir = os.path.dirname(os.path.abspath(bib_list_file))
+    listed = set(lines)
+    for output_path in sorted(output_paths):
+        line = os.path.relpath(os.path.abspath(output_path), base_dir).replace(os.sep, "/")
+        if line not in listed:
+            lines.append(line)
+            listed.add(line)
+    write_atomic(bib_list_file, "\n".join(lines) + "\n")
+
+
+def update_arxiv_index(bib_list_file):
+    """Index the arXiv IDs of the published entries in all listed files, one file at a time."""
+    arxiv_index = {}
+    start_dir = os.path.dirname(os.path.abspath(bib_list_file)) + "/"
+    for filename in bib_list_files(bib_list_file, start_dir):
+        with open(filename) as f:
+            arxiv_index.update(build_arxiv_index(json.load(f)))
+    arxiv_index_path = arxiv_index_path_for(bib_list_file)
+    write_arxiv_index(arxiv_index, arxiv_index_path)
+    logger.info("Built arXiv index: %s Size: %d", arxiv_index_path, len(arxiv_index))
+
+
+def build(raw_dir, data_dir, bib_list_file, names=None, jobs=None, force=False):
+    manifest_path = os.path.join(data_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    raw_bibs = find_raw_bibs(raw_dir)
+    if names:
+        raw_bibs = {name: path for name, path in raw_bibs.items() if name in names}
+
+    output_paths = {}
+    todo = {}
+    for name, raw_path in raw_bibs.items():
+        output_path = os.path.join(data_dir, name + ".bib.json")
+        output_paths[name] = output_path
+        sha256 = file_sha256(raw_path)
+        if not force and os.path.exists(output_path) and manifest.get(name, {}).get("sha256") == sha256:
+            continue
+        todo[name] = (raw_path, output_path, sha256)
+    logger.info("Raw files: %d To build: %d Unchanged: %d", len(raw_bibs), len(todo), len(raw_bibs) - len(todo))
+
+    num_failed = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(build_one, raw_path, output_path): name
+                   for name, (raw_path, output_path, _) in todo.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                size = future.result()
+            except Exception as e:
+                logger.error("Failed: %s %r", name, e)
+                num_failed += 1
+                del output_paths[name]
+                continue
+            logger.info("Built: %s Size: %d", output_paths[name], size)
+            manifest[name] = {"sha256": todo[name][2], "size": size}
+
+    write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    update_bib_list(bib_list_file, output_paths.values())
+    logger.info("Updated: %s", bib_list_file)
+    update_arxiv_index(bib_list_file)
+    logger.info("Wrote data manifest: %s", write_data_manifest(bib_list_file))
+    return num_failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the raw DBLP/ACL .bib files into the json data of Rebiber.")
+    parser.add_argument("names", nargs="*",
+                        help="Only build these conferences, e.g. iclr2020 (default: every raw .bib file).")
+    parser.add_argument("-r", "--raw_dir", default=filepath+"raw_data",
+                        type=str, help="The folder with the raw bib files.")
+    parser.add_argument("-d", "--data_dir", default=filepath+"data",
+                        type=str, help="The folder to write the json files to.")
+    parser.add_argument("-l", "--bib_list", default=filepath+"bib_list.txt",
+                        type=str, help="The list of candidate bib data to update.")
+    parser.add_argument("-j", "--jobs", default=None,
+                        type=int, help="The number of worker processes (default: number of CPUs).")
+    parser.add_argument("-f", "--force", action='store_true',
+                        help="Rebuild every file, even if its raw bib file did not change.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
+    num_failed = build(args.raw_dir, args.data_dir, args.bib_list, args.names, args.jobs, args.force)
+    if num_failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Tuple
+
+from rebiber.bib_index import hash_key
+
+# lone surrogates can come out of json.load and must survive the round trip
+ENCODING_ERRORS = "surrogatepass"
+
+
+class CompactBibDB:
+    """Read-only, compact in-memory store of the bib data.
+
+    Every distinct line is stored once as UTF-8 in one byte string; an entry is
+    a run of line ids, so lines shared by many entries (``}``, publishers,
+    booktitles, bibsource, ...) cost four bytes per use instead of a string
+    object. Keys are kept the same way and found by binary search over their
+    sorted hashes. Behaves like the dict it is built from for the operations
+    ``normalize_bib`` needs; ``get`` returns a new list of lines.
+    """
+
+    def __init__(self, bib_db: Dict[str, List[str]]):
+        line_ids = {}
+        line_blob = bytearray()
+        self._line_offsets = array("Q", [0])
+        self._entry_lines = array("I")
+        self._entry_offsets = array("Q", [0])
+        key_blob = bytearray()
+        self._key_offsets = array("Q", [0])
+        hashes = []
+        for i, (key, lines) in enumerate(bib_db.items()):
+            for line in lines:
+                line_id = line_ids.get(line)
+                if line_id is None:
+                    line_id = line_ids[line] = len(line_ids)
+                    line_blob += line.encode("utf8", ENCODING_ERRORS)
+                    self._line_offsets.append(len(line_blob))
+                self._entry_lines.append(line_id)
+            self._entry_offsets.append(len(self._entry_lines))
+            key_blob += key.encode("utf8", ENCODING_ERRORS)
+            self._key_offsets.append(len(key_blob))
+            hashes.append((hash_key(key), i))
+        hashes.sort()
+        self._lines = bytes(line_blob)
+        self._keys = bytes(key_blob)
+        self._hashes = array("Q", (h for h, _ in hashes))
+        self._order = array("I", (i for _, i in hashes))
+
+    @property
+    def num_lines(self) -> int:
+        """The number of distinct lines."""
+        return len(self._line_offsets) - 1
+
+    def _key_at(self, i: int) -> str:
+        return self._keys[self._key_offsets[i]:self._key_offsets[i + 1]].decode("utf8", ENCODING_ERRORS)
+
+    def _lines_at(self, i: int) -> List[str]:
+        lines, offsets = self._lines, self._line_offsets
+        return [lines[offsets[line_id]:offsets[line_id + 1]].decode("utf8", ENCODING_ERRORS)
+                for line_id in self._entry_lines[self._entry_offsets[i]:self._entry_offsets[i + 1]]]
+
+    def _lookup(self, key: str):
+        h = hash_key(key)
+        pos = bisect_left(self._hashes, h)
+        while pos < len(self._hashes) and self._hashes[pos] == h:
+            i = self._order[pos]
+            if self._key_at(i) == key:
+                return i
+            pos += 1
+        return None
+
+    def __getitem__(self, key: str) -> List[str]:
+        i = self._lookup(key)
+        if i is None:
+            raise KeyError(key)
+        return self._lines_at(i)
+
+    def get(self, key: str, default=None):
+        i = self._lookup(key)
+        return default if i is None else self._lines_at(i)
+
+    def __contains__(self, key) -> bool:
+        return isinstance(key, str) and self._lookup(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def items(self) -> Iterator[Tuple[str, List[str]]]:
+        for i in range(len(self)):
+            yield self._key_at(i), self._lines_at(i)
+
+    def keys(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self._key_at(i)
+
+    __iter__ = keys
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, Tuple
+
+from rebiber.bib_index import bib_list_files
+
+logger = logging.getLogger(__name__)
+
+# The manifest lists every data file by its path relative to the folder of the
+# bib list, with its sha256 and size:
+#   {"version": 1, "files": {"bib_list.txt": {"sha256": ..., "size": ...}, ...}}
+DATA_MANIFEST_NAME = "data_manifest.json"
+DATA_MANIFEST_VERSION = 1
+DEFAULT_UPDATE_SOURCE = "https://raw.githubusercontent.com/yuchenlin/rebiber/main/rebiber/"
+DOWNLOAD_SUFFIX = ".download"
+
+
+def data_manifest_path_for(bib_list_file):
+    return os.path.join(os.path.dirname(os.path.abspath(bib_list_file)), DATA_MANIFEST_NAME)
+
+
+def file_sha256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def build_data_manifest(bib_list_file, extra_files=("abbr.tsv",)) -> Dict:
+    """Describe the bib list, the files it lists and extra_files (if they exist) next to it."""
+    base_dir = os.path.dirname(os.path.abspath(bib_list_file)) + "/"
+    paths = [base_dir + name for name in extra_files if os.path.exists(base_dir + name)]
+    paths += [os.path.abspath(bib_list_file)] + [os.path.abspath(path) for path in bib_list_files(bib_list_file, base_dir)]
+    files = {}
+    for path in paths:
+        if not os.path.exists(path):
+            logger.warning("Listed in %s but missing: %s", bib_list_file, path)
+            continue
+        files[os.path.relpath(path, base_dir).replace(os.sep, "/")] = {"sha256": file_sha256(path),
+                                                                       "size": os.path.getsize(path)}
+    return {"version": DATA_MANIFEST_VERSION, "files": files}
+
+
+def write_data_manifest(bib_list_file, manifest=None) -> str:
+    manifest = manifest or build_data_manifest(bib_list_file)
+    manifest_path = data_manifest_path_for(bib_list_file)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp_path, manifest_path)
+    return manifest_path
+
+
+def open_source(source, name):
+    """Open the file name at source, a URL (http, https, file) or a local folder."""
+    if urllib.parse.urlparse(source).scheme in ("http", "https", "file"):
+        return urllib.request.urlopen(source.rstrip("/") + "/" + urllib.parse.quote(name), timeout=60)
+    return open(os.path.join(source, *name.split("/")), "rb")
+
+
+def is_not_found(error) -> bool:
+    """True if open_source failed because the file does not exist at the source."""
+    return (isinstance(error, FileNotFoundError)
+            or isinstance(error, urllib.error.HTTPError) and error.code == 404)
+
+
+def fetch_data_manifest(source) -> Dict:
+    with open_source(source, DATA_MANIFEST_NAME) as f:
+        manifest = json.loads(f.read().decode("utf8"))
+    if manifest.get("version") != DATA_MANIFEST_VERSION or not isinstance(manifest.get("files"), dict):
+        raise ValueError(f"{source} does not have a rebiber data manifest (version {DATA_MANIFEST_VERSION}).")
+    for name in manifest["files"]:
+        parts = name.split("/")
+        if name.startswith("/") or "\\" in name or ".." in parts or "" in parts:
+            raise ValueError(f"Unsafe path in the data manifest: {name}")
+    return manifest
+
+
+def _download(source, name, path, expected):
+    """Download name to path + DOWNLOAD_SUFFIX and check its sha256 and size."""
+    tmp_path = path + DOWNLOAD_SUFFIX
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open_source(source, name) as response, open(tmp_path, "wb") as f:
+            for block in iter(lambda: response.read(1 << 20), b""):
+                sha.update(block)
+                size += len(block)
+                f.write(block)
+        if sha.hexdigest() != expected["sha256"] or size != expected["size"]:
+            raise ValueError(f"Checksum mismatch for {name} from {source}")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def update_data(bib_list_file, source=DEFAULT_UPDATE_SOURCE, manifest=None) -> Tuple[int, int, int]:
+    """Bring the bib list and its data files in line with the data manifest at source.
+
+    Only files that are missing or whose content differs are downloaded. All
+    of them are verified before any is moved into place, each with an atomic
+    rename, and the bib list goes last, so an interrupted update leaves the old
+    data in use. Files that the previous manifest listed but the new one does
+    not are removed. manifest is the data manifest of source, if it has been
+    fetched already. Returns the numbers of downloaded, unchanged and removed files.
+    """
+    base_dir = os.path.dirname(os.path.abspath(bib_list_file)) + "/"
+    manifest = manifest or fetch_data_manifest(source)
+    manifest_path = data_manifest_path_for(bib_list_file)
+    old_files = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            old_files = json.load(f).get("files", {})
+
+    todo = []
+    for name, expected in manifest["files"].items():
+        path = base_dir + name
+        if os.path.exists(path) and os.path.getsize(path) == expected["size"]:
+            if file_sha256(path) == expected["sha256"]:
+                continue
+        todo.append((name, path, expected))
+    logger.info("Data files: %d To download: %d", len(manifest["files"]), len(todo))
+
+    downloads = []
+    try:
+        for name, path, expected in todo:
+            downloads.append((name, _download(source, name, path, expected), path))
+            logger.info("Downloaded: %s (%d bytes)", name, expected["size"])
+    except BaseException:
+        for _, tmp_path, _ in downloads:
+            os.remove(tmp_path)
+        raise
+    bib_list_name = os.path.relpath(os.path.abspath(bib_list_file), base_dir).replace(os.sep, "/")
+    for name, tmp_path, path in sorted(downloads, key=lambda download: download[0] == bib_list_name):
+        os.replace(tmp_path, path)
+
+    num_removed = 0
+    for name in old_files:
+        if name not in manifest["files"] and name != bib_list_name and os.path.exists(base_dir + name):
+            os.remove(base_dir + name)
+            logger.info("Removed: %s", name)
+            num_removed += 1
+    write_data_manifest(bib_list_file, manifest)
+    return len(downloads), len(manifest["files"]) - len(downloads), num_removed
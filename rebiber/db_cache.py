@@ -0,0 +1,58 @@
+import hashlib
+import os
+import pickle
+from typing import Optional, Tuple
+
+from rebiber.bib_index import bib_list_files
+
+FORMAT_VERSION = 2
+
+
+def default_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "rebiber")
+
+
+def bib_list_fingerprint(bib_list_file, start_dir=""):
+    """Hash of the bib list contents and the size and mtime of every listed file."""
+    fingerprint = hashlib.sha256()
+    fingerprint.update(str(FORMAT_VERSION).encode())
+    with open(bib_list_file, "rb") as f:
+        fingerprint.update(f.read())
+    for filename in bib_list_files(bib_list_file, start_dir):
+        stat = os.stat(filename)
+        fingerprint.update(f"\0{os.path.abspath(filename)}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf8"))
+    return fingerprint.hexdigest()
+
+
+def cache_path_for(bib_list_file, cache_dir=None):
+    cache_dir = cache_dir or default_cache_dir()
+    name = hashlib.sha256(os.path.abspath(bib_list_file).encode("utf8")).hexdigest()[:16]
+    return os.path.join(cache_dir, f"bibdb-{name}.pickle")
+
+
+def cached_index_path_for(bib_list_file, extension, cache_dir=None):
+    """Where an index is kept that cannot be written next to the bib list, e.g. in a read-only install."""
+    return os.path.splitext(cache_path_for(bib_list_file, cache_dir))[0] + extension
+
+
+def load_cached_db(cache_path, fingerprint) -> Optional[Tuple[dict, float]]:
+    """Return (bib_db, seconds the uncached load took) if the cache matches ``fingerprint``."""
+    try:
+        with open(cache_path, "rb") as f:
+            if pickle.load(f) != fingerprint:
+                return None
+            load_time = pickle.load(f)
+            return pickle.load(f), load_time
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def save_cached_db(cache_path, fingerprint, bib_db, load_time) -> None:
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + f".{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(fingerprint, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(load_time, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(bib_db, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
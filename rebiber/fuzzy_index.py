@@ -0,0 +1,198 @@
+import difflib
+import heapq
+import mmap
+import os
+import re
+import struct
+from array import array
+from collections import Counter, defaultdict
+from typing import List, Optional, Tuple
+
+from rebiber.bib2json import normalize_title
+from rebiber.bib_index import hash_key
+
+# Layout of a fuzzy index file:
+#   header:   magic, format version, number of titles, number of words, section offsets
+#   words:    one (word hash, postings offset, postings count) record per word, sorted by hash
+#   postings: uint32 title ids of each word
+#   titles:   uint64 offsets into the title blob, uint16 lengths of the normalized titles,
+#             then per title "normalized title\0main title"
+MAGIC = b"RBFUZZ\x00\x00"
+VERSION = 2
+HEADER = struct.Struct("<8sIQQQQQQ")
+WORD = struct.Struct("<QQI")
+
+_WORDS = re.compile(r"[a-z]+")
+_TITLE_FIELD = re.compile(r"^\s*title\s*=\s*", re.M | re.I)
+_SUBTITLE = re.compile(r"[:?]")
+
+# candidates are generated from the rarest words of the query only
+MAX_QUERY_WORDS = 4
+MAX_POSTINGS = 5000
+MAX_CANDIDATES = 10
+MIN_MAIN_TITLE_LENGTH = 12
+
+
+def fuzzy_index_path_for(bib_list_file):
+    return os.path.splitext(bib_list_file)[0] + ".fuzzy"
+
+
+def title_words(title: str) -> List[str]:
+    return _WORDS.findall(title.lower())
+
+
+def main_title(title: str) -> str:
+    """Normalized title without its subtitle, or "" if it is too short to be matched on its own."""
+    main = normalize_title(_SUBTITLE.split(title, 1)[0])
+    return main if len(main) >= MIN_MAIN_TITLE_LENGTH and main != normalize_title(title) else ""
+
+
+def entry_title(lines: List[str]) -> Optional[str]:
+    text = "".join(lines)
+    m = _TITLE_FIELD.search(text)
+    if m is None or m.end() >= len(text) or text[m.end()] not in '{"':
+        return None
+    start = m.end()
+    if text[start] == '"':
+        end = text.find('"', start + 1)
+        return text[start + 1:end] if end > 0 else None
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "{":
+            depth += 1
+        elif text[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:i]
+    return None
+
+
+def write_fuzzy_index(bib_db, index_path: str) -> None:
+    postings = defaultdict(list)
+    title_offsets = array("Q", [0])
+    title_lengths = array("H")
+    title_blob = bytearray()
+    for title_id, (key, lines) in enumerate(bib_db.items()):
+        title = entry_title(lines) or key
+        for word in set(title_words(title)):
+            postings[word].append(title_id)
+        title_blob += (key + "\0" + main_title(title)).encode("utf8")
+        title_offsets.append(len(title_blob))
+        title_lengths.append(min(len(key), 0xFFFF))
+
+    words = []
+    all_postings = array("I")
+    for word, title_ids in postings.items():
+        words.append((hash_key(word), len(all_postings), len(title_ids)))
+        all_postings.extend(title_ids)
+    words.sort()
+
+    words_offset = HEADER.size
+    postings_offset = words_offset + WORD.size * len(words)
+    titles_offset = postings_offset + all_postings.itemsize * len(all_postings)
+    lengths_offset = titles_offset + title_offsets.itemsize * len(title_offsets)
+    blob_offset = lengths_offset + title_lengths.itemsize * len(title_lengths)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(title_offsets) - 1, len(words),
+                            postings_offset, titles_offset, lengths_offset, blob_offset))
+        for word in words:
+            f.write(WORD.pack(*word))
+        f.write(all_postings.tobytes())
+        f.write(title_offsets.tobytes())
+        f.write(title_lengths.tobytes())
+        f.write(title_blob)
+    os.replace(tmp_path, index_path)
+
+
+class FuzzyIndex:
+    """Memory-mapped word index over all corpus titles for approximate title matching.
+
+    A query only looks at the titles that share its rarest words and scores
+    them by the similarity of the normalized titles (with and without subtitles),
+    so it does not scan the corpus.
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        with open(index_path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self._num_titles, self._num_words,
+         self._postings_offset, self._titles_offset, self._lengths_offset,
+         self._blob_offset) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{index_path} is not a rebiber fuzzy index (version {VERSION}).")
+        self._title_lengths = memoryview(self._mm)[self._lengths_offset:self._blob_offset].cast("H")
+
+    def _postings(self, word: str) -> Optional[Tuple[int, int]]:
+        h = hash_key(word)
+        lo, hi = 0, self._num_words
+        while lo < hi:
+            mid = (lo + hi) // 2
+            word_hash, offset, count = WORD.unpack_from(self._mm, HEADER.size + mid * WORD.size)
+            if word_hash == h:
+                return offset, count
+            if word_hash < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _title_ids(self, offset: int, count: int) -> memoryview:
+        start = self._postings_offset + 4 * offset
+        return memoryview(self._mm)[start:start + 4 * count].cast("I")
+
+    def _titles(self, title_id: int) -> Tuple[str, str]:
+        start, end = struct.unpack_from("<QQ", self._mm, self._titles_offset + 8 * title_id)
+        key, main = self._mm[self._blob_offset + start:self._blob_offset + end].decode("utf8").split("\0")
+        return key, main
+
+    def candidates(self, title: str) -> List[int]:
+        postings = []
+        for word in set(title_words(title)):
+            word_postings = self._postings(word)
+            if word_postings is not None:
+                offset, count = word_postings
+                postings.append((count, offset))
+        postings.sort()
+        if not postings:
+            return []
+        selected = [p for p in postings[:MAX_QUERY_WORDS] if p[0] <= MAX_POSTINGS] or postings[:1]
+        min_shared = 1 if len(selected) <= 2 else 2
+        shared = Counter()
+        for count, offset in selected:
+            title_ids = self._title_ids(offset, count)
+            shared.update(title_ids)
+            title_ids.release()
+        # among titles sharing as many words, prefer those of about the query's length
+        length = len(normalize_title(title))
+        ranked = ((-n, abs(self._title_lengths[title_id] - length), title_id)
+                  for title_id, n in shared.items() if n >= min_shared)
+        return [title_id for _, _, title_id in heapq.nsmallest(MAX_CANDIDATES, ranked)]
+
+    def match(self, title: str, threshold: float) -> Optional[Tuple[str, float]]:
+        """Return the normalized title of the most similar corpus entry and its score, if >= threshold."""
+        query_forms = [form for form in (normalize_title(title), main_title(title)) if form]
+        if not query_forms:
+            return None
+        best_key, best_score = None, threshold
+        for title_id in self.candidates(title):
+            key, main = self._titles(title_id)
+            for candidate in (key, main):
+                if not candidate:
+                    continue
+                for query in query_forms:
+                    matcher = difflib.SequenceMatcher(None, query, candidate, autojunk=False)
+                    if matcher.real_quick_ratio() < best_score or matcher.quick_ratio() < best_score:
+                        continue
+                    score = matcher.ratio()
+                    if score > best_score or (best_key is None and score >= best_score):
+                        best_key, best_score = key, score
+        return (best_key, best_score) if best_key is not None else None
+
+    def __len__(self) -> int:
+        return self._num_titles
+
+    def close(self) -> None:
+        self._title_lengths.release()
+        self._mm.close()
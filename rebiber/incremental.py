@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from rebiber.bib2json import iter_bib_records
+
+VERSION = 1
+
+
+def manifest_path_for(bib_path):
+    directory, filename = os.path.split(bib_path)
+    return os.path.join(directory, "." + filename + ".rebiber.json")
+
+
+def _entry_hash(raw: str) -> str:
+    return hashlib.sha256(raw.encode("utf8")).hexdigest()[:32]
+
+
+class EntryManifest:
+    """Sidecar of a bib file that maps the hash of each entry to its normalized form.
+
+    ``options`` describes everything the normalized entries depend on (e.g.
+    the version of the bib data and the command line options); a sidecar
+    written with other options is ignored. The entries of the output are
+    recorded as well, so that a file that was normalized in place is
+    recognized on the next run. Only the entries seen in the current run are
+    saved.
+    """
+
+    def __init__(self, path: str, options: Dict):
+        self.path = path
+        self.options = options
+        self.hits = 0
+        self._entries = {}
+        self._current = {}
+        self._by_key = {}
+        self._duplicate_keys = set()
+        try:
+            with open(path, encoding="utf8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == VERSION and manifest.get("options") == options:
+                self._entries = manifest["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def __contains__(self, record) -> bool:
+        return _entry_hash(record.raw) in self._entries
+
+    def covers(self, records) -> bool:
+        return all(record in self for record in records if record.fields is not None and "title" in record.fields)
+
+    def get(self, record) -> Optional[Tuple[List[str], int]]:
+        """Return (normalized lines, number of conversions) of an unchanged entry."""
+        entry = self._entries.get(_entry_hash(record.raw))
+        if entry is None:
+            return None
+        self.hits += 1
+        self.set(record, *entry)
+        return entry[0], entry[1]
+
+    def set(self, record, lines, num_converted: int) -> None:
+        entry = [list(lines), num_converted]
+        self._current[_entry_hash(record.raw)] = entry
+        if record.key in self._by_key:
+            self._duplicate_keys.add(record.key)
+        self._by_key[record.key] = entry
+
+    def add_output(self, output_string: str) -> None:
+        for record in iter_bib_records(output_string):
+            if record.fields is not None and record.key in self._by_key and record.key not in self._duplicate_keys:
+                self._current.setdefault(_entry_hash(record.raw), self._by_key[record.key])
+
+    def save(self) -> None:
+        tmp_path = self.path + f".{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf8") as f:
+            json.dump({"version": VERSION, "options": self.options, "entries": self._current}, f,
+                      separators=(",", ":"))
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,80 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from rebiber.db_cache import default_cache_dir
+
+
+class LookupCache:
+    """SQLite-backed cache of online lookup responses and of the user's selections.
+
+    Responses are keyed on the request (URL and Accept header), expire after
+    ``ttl`` seconds, and the least recently used ones are evicted once more
+    than ``max_entries`` are stored. Selections map a normalized title to the
+    entry the user picked, so the same title resolves without asking again.
+    The cache can be shared across threads.
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 30 * 24 * 3600, max_entries: int = 50000):
+        self.path = path or os.path.join(default_cache_dir(), "lookup.sqlite")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._num_sets = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses "
+                               "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS selections "
+                               "(title TEXT PRIMARY KEY, choice TEXT NOT NULL, created REAL NOT NULL)")
+            self._evict()
+
+    def _evict(self) -> None:
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        self._conn.execute("DELETE FROM responses WHERE key IN "
+                           "(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                           (self.max_entries,))
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, value, now, now))
+            self._num_sets += 1
+            if self._num_sets % self.EVICT_EVERY == 0:
+                self._evict()
+
+    def get_selection(self, title: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT choice FROM selections WHERE title = ?", (title,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set_selection(self, title: str, choice: Dict[str, str]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO selections VALUES (?, ?, ?)",
+                               (title, json.dumps(choice), time.time()))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,9 +1,15 @@
 from abc import ABC
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 from typing import List
+from typing import Optional
 from typing import Union
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import time
 import urllib
 import json
 import re
@@ -11,6 +17,8 @@ import bibtexparser
 import warnings
 
 from rebiber.bib2json import normalize_title
+from rebiber.lookup_cache import LookupCache
+from rebiber.metrics import metrics
 
 DictTree = Dict[str, Union[str, Dict[str, str]]]
 
@@ -23,71 +31,175 @@ def cleanup_title(title: str) -> str:
     return title
 
 
+class RateLimiter:
+    """Spaces out calls so that at most ``max_per_second`` start per second, across threads."""
+
+    def __init__(self, max_per_second: float):
+        self.min_interval = 1.0 / max_per_second if max_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.min_interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def make_session(pool_size: int = 10, max_retries: int = 3) -> requests.Session:
+    # once the retries are used up, the last response is returned, so that callers see its status code
+    retry = Retry(total=max_retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET"], respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class LookupService(ABC):
+    BASE_URL: str = ""
+    MAX_REQUESTS_PER_SECOND: float = 0
+
+    def __init__(self, base_url: Optional[str] = None, session: Optional[requests.Session] = None,
+                 max_requests_per_second: Optional[float] = None, timeout: float = 30,
+                 cache: Optional[LookupCache] = None):
+        self.base_url = (base_url or self.BASE_URL).rstrip("/")
+        self.cache = cache
+        self.session = session or make_session()
+        if max_requests_per_second is None:
+            max_requests_per_second = self.MAX_REQUESTS_PER_SECOND
+        self.rate_limiter = RateLimiter(max_requests_per_second)
+        self.timeout = timeout
+
+    def _get(self, path: str, **kwargs) -> requests.Response:
+        self.rate_limiter.wait()
+        metrics.count("lookup_requests")
+        return self.session.get(self.base_url + path, timeout=self.timeout, **kwargs)
+
+    def _get_text(self, path: str, headers: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Body of a successful GET request, served from the cache when possible."""
+        cache_key = self.base_url + path + "\n" + (headers or {}).get("Accept", "")
+        if self.cache is not None:
+            text = self.cache.get(cache_key)
+            if text is not None:
+                metrics.count("lookup_cache_hits")
+                return text
+        response = self._get(path, headers=headers)
+        if response.status_code != 200:
+            warnings.warn(f"Unknown error occurred. Status code {response.status_code}.")
+            return None
+        if self.cache is not None:
+            self.cache.set(cache_key, response.text)
+        return response.text
+
     @abstractmethod
-    def get_suggestions(bib_entry: Dict[str, str], max_suggestions: int) -> List[Dict[str, str]]:
+    def get_suggestions(self, bib_entry: Dict[str, str], max_suggestions: int) -> List[Dict[str, str]]:
         pass
 
 
 class DBLPLookupService(LookupService):
-    QUERY_TEMPLATE: str = "https://dblp.org/search/publ/api?format=bibtex&h={0}&q={1}"
+    BASE_URL: str = "https://dblp.org"
+    QUERY_TEMPLATE: str = "/search/publ/api?format=bibtex&h={0}&q={1}"
+    MAX_REQUESTS_PER_SECOND: float = 5
 
     def get_suggestions(self, bib_entry: Dict[str, str], max_suggestions: int) -> List[Dict[str, str]]:
         bibparser = bibtexparser.bparser.BibTexParser(ignore_nonstandard_types=False)
 
         normalized_title = urllib.parse.quote_plus(cleanup_title(bib_entry["title"]))
-        request_url = DBLPLookupService.QUERY_TEMPLATE.format(max_suggestions, normalized_title)
-        response = requests.get(request_url)
-        if response.status_code == 200:
-            response_data = response.text
+        response_data = self._get_text(DBLPLookupService.QUERY_TEMPLATE.format(max_suggestions, normalized_title))
+        if response_data is not None:
             potential_items = bibtexparser.loads(response_data, bibparser).entries
             return potential_items
         else:
-            warnings.warn(f"Unknown error occurred. Status code {response.status_code}.")
             return []
 
 
 class CrossrefLookupService(LookupService):
-    QUERY_TEMPLATE: str = "https://api.crossref.org/v1/works?rows={0}&query.title={1}"
-    BIBTEX_QUERY_TEMPLATE: str = "https://api.crossref.org/v1/works/{0}/transform"
+    BASE_URL: str = "https://api.crossref.org"
+    QUERY_TEMPLATE: str = "/v1/works?rows={0}&query.title={1}"
+    BIBTEX_QUERY_TEMPLATE: str = "/v1/works/{0}/transform"
+    MAX_REQUESTS_PER_SECOND: float = 20
+
+    def __init__(self, *args, max_workers: int = 4, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the BibTeX of the DOIs of one query are fetched concurrently
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
 
-    def __load_bibtex(self, doi: str) -> None:
+    def __load_bibtex(self, doi: str) -> Optional[Dict[str, str]]:
         bibparser = bibtexparser.bparser.BibTexParser(ignore_nonstandard_types=False)
 
         encoded_doi = urllib.parse.quote_plus(doi)
-        request_url = CrossrefLookupService.BIBTEX_QUERY_TEMPLATE.format(encoded_doi)
-        response = requests.get(
-            request_url,
-            headers={"Accept": "application/x-bibtex",
-            "Accept-Encoding": "gzip, deflate, br"})
-        if response.status_code == 200:
-            response_data = response.text
-            return bibtexparser.loads(response_data, bibparser).entries[0]
+        try:
+            response_data = self._get_text(
+                CrossrefLookupService.BIBTEX_QUERY_TEMPLATE.format(encoded_doi),
+                headers={"Accept": "application/x-bibtex",
+                "Accept-Encoding": "gzip, deflate, br"})
+        except requests.RequestException as e:
+            # the other DOIs of the query can still be suggested
+            warnings.warn(f"Could not load the BibTeX of {doi}: {e!r}")
+            return None
+        if response_data is not None:
+            entries = bibtexparser.loads(response_data, bibparser).entries
+            return entries[0] if entries else None
         else:
-            warnings.warn(f"Unknown error occurred. Status code {response.status_code}.")
             return None
         
 
     def get_suggestions(self, bib_entry: Dict[str, str], max_suggestions: int) -> List[Dict[str, str]]:
         normalized_title = urllib.parse.quote_plus(cleanup_title(bib_entry["title"]))
-        request_url = CrossrefLookupService.QUERY_TEMPLATE.format(max_suggestions, normalized_title)
-        response = requests.get(request_url)
-        if response.status_code == 200:
-            response_data = response.json()
+        response_text = self._get_text(CrossrefLookupService.QUERY_TEMPLATE.format(max_suggestions, normalized_title))
+        if response_text is not None:
+            response_data = json.loads(response_text)
             raw_potential_items = response_data["message"]["items"]
-            unique_dois = list(set([it["DOI"] for it in raw_potential_items]))
-            potential_items = [self.__load_bibtex(doi) for doi in unique_dois]
-            
-            unique_dois = list(set([it["doi"] for it in potential_items]))
+            unique_dois = list(dict.fromkeys([it["DOI"] for it in raw_potential_items]))
+            potential_items = [it for it in self._executor.map(self.__load_bibtex, unique_dois) if it is not None]
 
             used_dois = set()
             filtered_potential_items = []
             for pi in potential_items:
-                if pi["doi"] in used_dois:
+                if pi.get("doi") in used_dois:
                     continue
                 else:
-                    used_dois.add(pi["doi"])
+                    used_dois.add(pi.get("doi"))
                     filtered_potential_items.append(pi)
 
             return filtered_potential_items
-            
\ No newline at end of file
+        else:
+            return []
+
+
+class LookupEngine:
+    """Queries several lookup services for many entries concurrently.
+
+    Each service keeps its own pooled session and rate limit, so the
+    suggestions for all entries can be prefetched before asking the user.
+    """
+
+    def __init__(self, services: List[LookupService], max_workers: int = 8, cache: Optional[LookupCache] = None):
+        self.services = services
+        self.max_workers = max_workers
+        self.cache = cache
+
+    def _get_service_suggestions(self, service: LookupService, bib_entry: Dict[str, str],
+                                 max_suggestions: int) -> List[Dict[str, str]]:
+        try:
+            return service.get_suggestions(bib_entry, max_suggestions)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            warnings.warn(f"{type(service).__name__} failed for '{bib_entry.get('title', '')}': {e!r}")
+            return []
+
+    def prefetch(self, bib_entries: List[Dict[str, str]], max_suggestions: int) -> List[List[Dict[str, str]]]:
+        """Return the suggestions of all services (in order) for each of ``bib_entries``."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [[executor.submit(self._get_service_suggestions, service, bib_entry, max_suggestions)
+                        for service in self.services]
+                       for bib_entry in bib_entries]
+            return [[s for future in entry_futures for s in future.result()] for entry_futures in futures]
+
+
+def default_lookup_engine(use_cache: bool = True) -> LookupEngine:
+    cache = LookupCache() if use_cache else None
+    return LookupEngine([DBLPLookupService(cache=cache), CrossrefLookupService(cache=cache)], cache=cache)
@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Metrics:
+    """Counters and cumulative stage timers of a rebiber process.
+
+    Counters count events such as database hits or online lookups; timers
+    add up the wall time spent in each stage. Both can be updated from
+    several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.timers = Counter()
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timers[name] += seconds
+
+    @contextmanager
+    def timer(self, name: str):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def merge(self, other: Dict) -> None:
+        """Add the counters and timers of another process, as returned by to_dict."""
+        with self._lock:
+            self.counters.update(other.get("counters", {}))
+            self.timers.update(other.get("timers", {}))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.timers.clear()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {"counters": dict(self.counters), "timers": {name: round(t, 6) for name, t in self.timers.items()}}
+
+    def report(self) -> str:
+        metrics = self.to_dict()
+        lines = ["%-24s %10s" % ("stage", "seconds")]
+        lines += ["%-24s %10.3f" % (name, t) for name, t in metrics["timers"].items()]
+        lines += ["", "%-24s %10s" % ("counter", "value")]
+        lines += ["%-24s %10d" % (name, n) for name, n in sorted(metrics["counters"].items())]
+        return "\n".join(lines)
+
+
+# the metrics of this process
+metrics = Metrics()
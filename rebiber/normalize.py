@@ -1,29 +1,180 @@
 import rebiber
-from rebiber.bib2json import normalize_title, load_bib_file
+from rebiber.bib2json import (normalize_title, load_bib_records, iter_bib_records, parse_entry, BibRecord,
+                              find_arxiv_ids)
 import argparse
+import glob
 import json
+import logging
+import multiprocessing
 import bibtexparser
 from bibtexparser.bwriter import BibTexWriter
 import os
-import re
-from typing import Dict, List
+import sys
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
 import termcolor
 
-from rebiber.lookup_service import DBLPLookupService, CrossrefLookupService, cleanup_title
-
-
-
-def construct_bib_db(bib_list_file, start_dir=""):
+from rebiber.abbr_matcher import AbbrMatcher
+from rebiber.lookup_service import default_lookup_engine, cleanup_title
+from rebiber.bib_index import BibIndex, index_path_for, is_index_fresh, write_bib_index
+from rebiber.bib_database import BibDatabase, build_shard_map, shard_map_path_for, write_shard_map
+from rebiber.compact_db import CompactBibDB
+from rebiber.db_cache import (bib_list_fingerprint, cache_path_for, cached_index_path_for, load_cached_db,
+                              save_cached_db)
+from rebiber.build import update_arxiv_index
+from rebiber.data_update import DEFAULT_UPDATE_SOURCE, fetch_data_manifest, file_sha256, is_not_found, update_data
+from rebiber.incremental import EntryManifest, manifest_path_for
+from rebiber.fuzzy_index import FuzzyIndex, fuzzy_index_path_for, write_fuzzy_index
+from rebiber.arxiv_index import arxiv_index_path_for, build_arxiv_index, read_arxiv_index, write_arxiv_index
+from rebiber.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def construct_bib_db(bib_list_file, start_dir="", use_index=True, lazy=False, use_cache=True):
+    if lazy:
+        bib_db = BibDatabase(bib_list_file, start_dir)
+        logger.info("Lazy database: %d files", len(bib_db.shard_files))
+        return bib_db
+    if use_index:
+        index_path = index_path_for(bib_list_file)
+        if is_index_fresh(index_path, bib_list_file, start_dir):
+            bib_db = BibIndex(index_path)
+            logger.info("Loaded index: %s Size: %d", index_path, len(bib_db))
+            return bib_db
+    if use_cache:
+        fingerprint = bib_list_fingerprint(bib_list_file, start_dir)
+        cache_path = cache_path_for(bib_list_file)
+        start_time = time.time()
+        cached = load_cached_db(cache_path, fingerprint)
+        if cached is not None:
+            bib_db, load_time = cached
+            metrics.count("db_cache_hits")
+            logger.info("Cache hit: %s Size: %d Time saved: %.2fs", cache_path, len(bib_db),
+                        load_time - (time.time() - start_time))
+            return bib_db
+        metrics.count("db_cache_misses")
+        logger.info("Cache miss: %s", cache_path)
+    start_time = time.time()
     with open(bib_list_file) as f:
         filenames = f.readlines()
     bib_db = {}
     for filename in filenames:
         with open(start_dir+filename.strip()) as f:
             db = json.load(f)
-            print("Loaded:", f.name, "Size:", len(db))
+            logger.info("Loaded: %s Size: %d", f.name, len(db))
         bib_db.update(db)
+    bib_db = CompactBibDB(bib_db)
+    logger.info("Compacted: %d entries, %d distinct lines", len(bib_db), bib_db.num_lines)
+    if use_cache:
+        try:
+            save_cached_db(cache_path, fingerprint, bib_db, time.time() - start_time)
+        except OSError as e:
+            logger.warning("Could not write cache: %s", e)
     return bib_db
 
+def build_index(bib_list_file, start_dir=""):
+    bib_db = construct_bib_db(bib_list_file, start_dir, use_index=False)
+    index_path = index_path_for(bib_list_file)
+    write_bib_index(bib_db, index_path)
+    logger.info("Compiled index: %s", index_path)
+    shard_map_path = shard_map_path_for(bib_list_file)
+    write_shard_map(*build_shard_map(bib_list_file, start_dir), shard_map_path)
+    logger.info("Built shard map: %s", shard_map_path)
+    fuzzy_index_path = fuzzy_index_path_for(bib_list_file)
+    write_fuzzy_index(bib_db, fuzzy_index_path)
+    logger.info("Built fuzzy index: %s", fuzzy_index_path)
+    arxiv_index_path = arxiv_index_path_for(bib_list_file)
+    arxiv_index = build_arxiv_index(bib_db)
+    write_arxiv_index(arxiv_index, arxiv_index_path)
+    logger.info("Built arXiv index: %s Size: %d", arxiv_index_path, len(arxiv_index))
+
+def open_fuzzy_index(fuzzy_index_path, bib_list_file, start_dir=""):
+    """The fuzzy index at fuzzy_index_path, or None if it is outdated or has another format version."""
+    if not is_index_fresh(fuzzy_index_path, bib_list_file, start_dir):
+        return None
+    try:
+        return FuzzyIndex(fuzzy_index_path)
+    except ValueError:
+        return None
+
+def load_fuzzy_index(bib_list_file, start_dir="", bib_db=None):
+    fuzzy_index_path = fuzzy_index_path_for(bib_list_file)
+    # used if the index cannot be written next to the bib list, e.g. in a read-only install
+    cached_index_path = cached_index_path_for(bib_list_file, ".fuzzy")
+    fuzzy_index = open_fuzzy_index(fuzzy_index_path, bib_list_file, start_dir)
+    if fuzzy_index is None:
+        fuzzy_index = open_fuzzy_index(cached_index_path, bib_list_file, start_dir)
+    if fuzzy_index is None:
+        if bib_db is None or not hasattr(bib_db, "items"):
+            bib_db = construct_bib_db(bib_list_file, start_dir)
+        try:
+            write_fuzzy_index(bib_db, fuzzy_index_path)
+        except OSError as e:
+            logger.warning("Could not write fuzzy index: %s", e)
+            fuzzy_index_path = cached_index_path
+            os.makedirs(os.path.dirname(fuzzy_index_path), exist_ok=True)
+            write_fuzzy_index(bib_db, fuzzy_index_path)
+        logger.info("Built fuzzy index: %s", fuzzy_index_path)
+        fuzzy_index = FuzzyIndex(fuzzy_index_path)
+    logger.info("Loaded fuzzy index: %s Size: %d", fuzzy_index.index_path, len(fuzzy_index))
+    return fuzzy_index
+
+def load_arxiv_index(bib_list_file, start_dir="", bib_db=None):
+    arxiv_index_path = arxiv_index_path_for(bib_list_file)
+    # used if the index cannot be written next to the bib list, e.g. in a read-only install
+    cached_index_path = cached_index_path_for(bib_list_file, ".arxiv.json")
+    for index_path in (arxiv_index_path, cached_index_path):
+        if is_index_fresh(index_path, bib_list_file, start_dir):
+            return read_arxiv_index(index_path)
+    if bib_db is None or not hasattr(bib_db, "items"):
+        return None
+    arxiv_index = build_arxiv_index(bib_db)
+    try:
+        write_arxiv_index(arxiv_index, arxiv_index_path)
+    except OSError as e:
+        logger.warning("Could not write arXiv index: %s", e)
+        arxiv_index_path = cached_index_path
+        try:
+            os.makedirs(os.path.dirname(arxiv_index_path), exist_ok=True)
+            write_arxiv_index(arxiv_index, arxiv_index_path)
+        except OSError as e:
+            logger.warning("Could not write arXiv index: %s", e)
+            return arxiv_index
+    logger.info("Built arXiv index: %s Size: %d", arxiv_index_path, len(arxiv_index))
+    return arxiv_index
+
+def lazy_lookup_keys(records, arxiv_index=None):
+    """The keys find_db_entry looks up first for records: their titles and the titles of their arXiv IDs."""
+    for record in records:
+        if record is None or record.fields is None or "title" not in record.fields:
+            continue
+        yield normalize_title(record.fields["title"])
+        if arxiv_index:
+            arxiv_ids = set(find_arxiv_ids(record.raw))
+            if len(arxiv_ids) == 1 and arxiv_ids <= arxiv_index.keys():
+                yield arxiv_index[arxiv_ids.pop()]
+
+def find_db_entry(bib_db, record, fuzzy_index=None, fuzzy_threshold=None, arxiv_index=None):
+    """Return (db entry, how it was matched) for a record; how is None for exact title matches."""
+    title = normalize_title(record.fields["title"])
+    db_entry = bib_db.get(title) if title else None
+    if db_entry is not None:
+        return db_entry, None
+    if arxiv_index:
+        arxiv_ids = set(find_arxiv_ids(record.raw))
+        if len(arxiv_ids) == 1:
+            arxiv_id = arxiv_ids.pop()
+            if arxiv_id in arxiv_index:
+                db_entry = bib_db.get(arxiv_index[arxiv_id])
+                if db_entry is not None:
+                    return db_entry, "arXiv %s" % arxiv_id
+    if title and fuzzy_index is not None and fuzzy_threshold is not None:
+        match = fuzzy_index.match(record.fields["title"], fuzzy_threshold)
+        if match is not None:
+            return bib_db.get(match[0]), "fuzzy match, score %.2f" % match[1]
+    return None, None
+
 def has_integer(line):
     return any(char.isdigit() for char in line)
 
@@ -39,36 +190,86 @@ def is_contain_var(line):
             return True
     return False
 
-def post_processing(output_bib_entries, removed_value_names, abbr_dict, sort):
-    bibparser = bibtexparser.bparser.BibTexParser(ignore_nonstandard_types=False)
-    bib_entry_str = ""
+def read_output_entries(output_bib_entries):
+    """Read the output entries the way bibtexparser reads their concatenation, without bibtexparser.
+
+    Returns (records, comments): the parsed entries, and the comments made of
+    the text between them (runs of text without ``@`` are implicit comments).
+    Returns None if some entry is not accepted by ``parse_entry``.
+    """
+    records = []
+    comments = []
+    pending = ""
     for entry in output_bib_entries:
-        for line in entry:
-            if is_contain_var(line):
-                continue
-            bib_entry_str += line
-        bib_entry_str += "\n"
-    parsed_entries  = bibtexparser.loads(bib_entry_str, bibparser)
-    
-    if len(parsed_entries.entries) < len(output_bib_entries)-5:
-        print("Warning: len(parsed_entries.entries) < len(output_bib_entries) -5 -->", len(parsed_entries.entries), len(output_bib_entries))
-        output_str = ""
-        for entry in output_bib_entries:
-            for line in entry:
-                # if any([re.match(r".*%s.*=.*"%n, line) for n in removed_value_names if len(n)>1]):
-                #     continue
-                output_str += line
-            output_str += "\n"
-        return output_str
+        text = "".join(line for line in entry if not is_contain_var(line)) + "\n"
+        if "@" not in text:
+            pending += text
+            continue
+        record = parse_entry(text)
+        if record is None:
+            return None
+        records.append(record)
+        if pending.strip(" \t\r\n"):
+            comments.append(pending.strip(" \t\r\n"))
+        pending = ""
+    if pending.strip(" \t\r\n"):
+        comments.append(pending.strip(" \t\r\n"))
+    if any("\t" in comment or "\ufeff" in comment for comment in comments):
+        return None  # bibtexparser expands tabs and strips a leading byte order mark
+    return records, comments
+
+
+def format_bib_entry(record: BibRecord, removed_value_names, abbr_matcher) -> str:
+    """Write a parsed entry the way BibTexWriter does: fields sorted by name, values in braces."""
+    fields = {name: value for name, value in record.fields.items() if name not in removed_value_names}
+    if abbr_matcher:
+        for place in ["booktitle", "journal"]:
+            if place in fields:
+                fields[place] = abbr_matcher.shorten(fields[place])
+    return "@%s{%s%s\n}\n" % (record.type, record.key,
+                               "".join(",\n %s = {%s}" % (name, fields[name]) for name in sorted(fields)))
+
+
+def post_processing(output_bib_entries, removed_value_names, abbr_dict, sort):
+    abbr_matcher = abbr_dict if isinstance(abbr_dict, AbbrMatcher) else AbbrMatcher(abbr_dict)
+    parsed = None
+    if "ENTRYTYPE" not in removed_value_names and "ID" not in removed_value_names:
+        parsed = read_output_entries(output_bib_entries)
+    if parsed is not None:
+        records, comments = parsed
+        num_parsed = len(records)
+        metrics.count("direct_writes")
+    else:
+        bibparser = bibtexparser.bparser.BibTexParser(ignore_nonstandard_types=False)
+        bib_entry_str = "".join("".join(line for line in entry if not is_contain_var(line)) + "\n"
+                                for entry in output_bib_entries)
+        parsed_entries  = bibtexparser.loads(bib_entry_str, bibparser)
+        num_parsed = len(parsed_entries.entries)
+        metrics.count("bibtexparser_writes")
+
+    if num_parsed < len(output_bib_entries)-5:
+        logger.warning("Warning: len(parsed_entries.entries) < len(output_bib_entries) -5 --> %d %d",
+                       num_parsed, len(output_bib_entries))
+        # if any([re.match(r".*%s.*=.*"%n, line) for n in removed_value_names if len(n)>1]):
+        #     continue
+        return "".join("".join(entry) + "\n" for entry in output_bib_entries)
+
+    if parsed is not None:
+        # the same text as BibTexWriter: comments first, then the entries (sorted by key if sort)
+        if sort:
+            records = sorted(records, key=lambda record: record.key.lower())
+        removed_value_names = set(removed_value_names)
+        return "".join("@comment{%s}\n\n" % comment for comment in comments) + "\n".join(
+            format_bib_entry(record, removed_value_names, abbr_matcher) for record in records)
+
     for output_entry in parsed_entries.entries:
         for remove_name in removed_value_names:
             if remove_name in output_entry:
                 del output_entry[remove_name]
-        for (short, pattern) in abbr_dict:
+        if abbr_matcher:
             for place in ["booktitle", "journal"]:
                 if place in output_entry:
-                    if re.match(pattern, output_entry[place]):
-                        output_entry[place] = short
+                    output_entry[place] = abbr_matcher.shorten(output_entry[place])
 
     writer = BibTexWriter()
     if not sort:
@@ -114,23 +315,90 @@ def get_online_selection(title: str, authors: str, year: int, suggestions: List[
             return suggestions[int(choice)]
 
 
-def normalize_bib(bib_db, all_bib_entries, output_bib_path, deduplicate=True, removed_value_names=[], abbr_dict=[],
-                  sort=False, use_lookup_services: bool = False):
+def to_bib_record(bib_entry):
+    """Accept either a BibRecord or a list of lines as returned by load_bib_file."""
+    if bib_entry is None or isinstance(bib_entry, BibRecord):
+        return bib_entry
+    bib_entry_str = " ".join([line for line in bib_entry if not is_contain_var(line)])
+    return next((record for record in iter_bib_records(bib_entry_str) if record.fields is not None), None)
+
+
+def to_bib_dict(record):
+    # Same layout as the bibtexparser entry of the former line-based reader,
+    # which skipped month and @string macro lines.
+    bib_dict = {name: value for name, value in reversed(list(record.fields.items()))
+                if name != "month" and name not in record.macro_fields}
+    bib_dict["ENTRYTYPE"] = record.type
+    bib_dict["ID"] = record.key
+    return bib_dict
+
+
+class EntryResult(NamedTuple):
+    """What happened to one input entry.
+
+    ``status`` is one of "converted" (found in the bib data, by title or as
+    described by ``matched_by``), "arxiv" (rewritten as an arXiv preprint),
+    "online" (replaced by an online suggestion), "unchanged" (taken from an
+    incremental sidecar), "not_found" (kept as is), "duplicate" (dropped),
+    "no_title" (dropped) or "malformed" (dropped).
+    """
+    key: Optional[str]
+    title: Optional[str]
+    status: str
+    matched_by: Optional[str] = None
+
+    @property
+    def converted(self) -> bool:
+        return self.status in ("converted", "arxiv", "online")
+
+
+def prefetch_online_suggestions(bib_db, records, lookup_engine, fuzzy_index=None, fuzzy_threshold=None, arxiv_index=None,
+                                manifest=None):
+    """Look up all entries that are not in bib_db at once, before the interactive selection."""
+    unmatched = {}
+    for entry_idx, record in enumerate(records):
+        if record is None or record.fields is None or "title" not in record.fields:
+            continue
+        if manifest is not None and record in manifest:
+            continue
+        title = normalize_title(record.fields["title"])
+        if find_db_entry(bib_db, record, fuzzy_index, fuzzy_threshold, arxiv_index)[0] is not None:
+            continue
+        if title and lookup_engine.cache is not None and lookup_engine.cache.get_selection(title) is not None:
+            continue
+        unmatched[entry_idx] = to_bib_dict(record)
+    logger.info("Looking up %d entries online...", len(unmatched))
+    with metrics.timer("online_lookup"):
+        suggestions = lookup_engine.prefetch(list(unmatched.values()), 3)
+    return dict(zip(unmatched.keys(), suggestions))
+
+
+def match_bib_entries(bib_db, all_bib_entries, deduplicate=True, use_lookup_services: bool = False, lookup_engine=None,
+                      fuzzy_index=None, fuzzy_threshold=None, arxiv_index=None, manifest=None,
+                      results=None) -> Tuple[list, int]:
+    """Return the lines of every output entry (before post-processing) and the number of converted entries.
+
+    With an EntryManifest, the entries it already contains are not normalized again.
+    If results is a list, an EntryResult is appended to it for every input entry.
+    """
+    if isinstance(bib_db, BibDatabase):
+        # read the titles shard by shard instead of in input order
+        all_bib_entries = [to_bib_record(bib_entry) for bib_entry in all_bib_entries]
+        with metrics.timer("prefetch"):
+            bib_db.prefetch(lazy_lookup_keys(all_bib_entries, arxiv_index))
     if use_lookup_services:
-        dblp_lookup_service = DBLPLookupService()
-        crossref_lookup_service = CrossrefLookupService()
+        lookup_engine = lookup_engine or default_lookup_engine()
+        all_bib_entries = [to_bib_record(bib_entry) for bib_entry in all_bib_entries]
+        online_suggestions = prefetch_online_suggestions(bib_db, all_bib_entries, lookup_engine,
+                                                         fuzzy_index, fuzzy_threshold, arxiv_index, manifest)
     output_bib_entries = []
     num_converted = 0
     bib_keys = set()
 
     def _proc_arxiv(bib_dict, original_bibkey, original_title):
         nonlocal num_converted
-        bib_dict["arxiv_id"] = set()
-        for match in re.finditer(
-            r"(arxiv:|arxiv.org\/abs\/|arxiv.org\/pdf\/)([0-9]{4}).([0-9]{5})", bib_entry_str.lower()
-        ):
-            bib_dict["arxiv_id"].add(f"{match.group(2)}.{match.group(3)}")
-            
+        bib_dict["arxiv_id"] = set(find_arxiv_ids(bib_entry_str))
+
         if len(bib_dict["arxiv_id"]) == 1:
             bib_dict["arxiv_id"] = bib_dict["arxiv_id"].pop()
             bib_dict["arxiv_year"] = "20" + bib_dict["arxiv_id"].split(".")[0][:2]
@@ -148,68 +416,101 @@ def normalize_bib(bib_db, all_bib_entries, output_bib_path, deduplicate=True, re
                 )
             ]
 
-            log_str = "Normalized arXiv entry. ID: %s ; Title: %s" % (
-                original_bibkey,
-                original_title,
-            )
             num_converted += 1
-            print(log_str)
+            metrics.count("arxiv_conversions")
+            logger.debug("Normalized arXiv entry. ID: %s ; Title: %s", original_bibkey, original_title)
 
             return bib_entry
         
         return bib_dict
 
+    def _add_result(record, status, matched_by=None):
+        if results is not None:
+            title = record.fields.get("title") if record.fields is not None else None
+            results.append(EntryResult(record.key, title, status, matched_by))
 
-    for bib_entry in all_bib_entries:
+    start_time = time.perf_counter()
+    for entry_idx, bib_entry in enumerate(all_bib_entries):
         # read the title from this bib_entry
-        bibparser = bibtexparser.bparser.BibTexParser(ignore_nonstandard_types=False)
-        original_title = ""
-        original_bibkey = ""
-        bib_entry_str = " ".join([line for line in bib_entry if not is_contain_var(line)])
-        bib_entry_parsed = bibtexparser.loads(bib_entry_str, bibparser)
-        if len(bib_entry_parsed.entries)==0 or "title" not in bib_entry_parsed.entries[0]:
+        record = to_bib_record(bib_entry)
+        if record is not None and record.fields is None:
+            metrics.count("malformed_entries")
+            logger.warning("Skipped a malformed entry: %s", record.key or record.raw.strip().split("\n")[0])
+            _add_result(record, "malformed")
+        if record is None or record.fields is None or "title" not in record.fields:
+            if record is not None and record.fields is not None:
+                _add_result(record, "no_title")
             continue
-        original_title = bib_entry_parsed.entries[0]["title"]
-        original_bibkey = bib_entry_parsed.entries[0]["ID"]
+        metrics.count("entries")
+        bib_entry_str = record.raw
+        original_title = record.fields["title"]
+        original_bibkey = record.key
         if deduplicate and original_bibkey in bib_keys:
+            metrics.count("duplicates")
+            _add_result(record, "duplicate")
             continue
         bib_keys.add(original_bibkey)
+        if manifest is not None:
+            unchanged = manifest.get(record)
+            if unchanged is not None:
+                metrics.count("unchanged_entries")
+                _add_result(record, "unchanged")
+                output_bib_entries.append(unchanged[0])
+                num_converted += unchanged[1]
+                continue
+            num_output_entries, num_converted_before = len(output_bib_entries), num_converted
         title = normalize_title(original_title)
         # try to map the bib_entry to the keys in all_bib_entries
         found_bibitem = None
-        if title in bib_db and title:
+        db_entry, matched_by = find_db_entry(bib_db, record, fuzzy_index, fuzzy_threshold, arxiv_index)
+        if db_entry is not None:
             # update the bib_key to be the original_bib_key
-            for line_idx in range(len(bib_db[title])):
-                line = bib_db[title][line_idx]
+            for line_idx in range(len(db_entry)):
+                line = db_entry[line_idx]
                 if line.strip().startswith("@"):
                     bibkey = line[line.find('{')+1:-1]
                     if not bibkey:
-                        bibkey = bib_db[title][line_idx+1].strip()[:-1]
+                        bibkey = db_entry[line_idx+1].strip()[:-1]
                     line = line.replace(bibkey, original_bibkey+",")
-                    found_bibitem = bib_db[title].copy()
+                    found_bibitem = db_entry.copy()
                     found_bibitem[line_idx] = line
                     break
 
             if found_bibitem is not None:
-                log_str = "Converted. ID: %s ; Title: %s" % (original_bibkey, original_title.replace("\n", " ").replace("  ", " "))
                 num_converted += 1
-                print(log_str)
+                if matched_by is None:
+                    metrics.count("db_hits")
+                    logger.debug("Converted. ID: %s ; Title: %s", original_bibkey,
+                                 original_title.replace("\n", " ").replace("  ", " "))
+                else:
+                    metrics.count("arxiv_index_hits" if matched_by.startswith("arXiv") else "fuzzy_hits")
+                    logger.info("Converted (%s). ID: %s ; Title: %s", matched_by, original_bibkey,
+                                original_title.replace("\n", " ").replace("  ", " "))
+                _add_result(record, "converted", matched_by)
                 output_bib_entries.append(found_bibitem)
             else:
                 raise RuntimeError("This should never happen.")
         else:
-            bib_dict = bib_entry_parsed.entries[0]
+            metrics.count("db_misses")
+            bib_dict = to_bib_dict(record)
             if use_lookup_services:
-                suggestions_dblp = dblp_lookup_service.get_suggestions(bib_dict, 3)
-                suggestions_cr = crossref_lookup_service.get_suggestions(bib_dict, 3)
-                suggestions = suggestions_dblp + suggestions_cr
-                
-                suggestions = [s for s in suggestions if "journal" not in s or s["journal"] != "CoRR"]
-                
-                choice = get_online_selection(bib_dict["title"], bib_dict["author"], bib_dict.get("year", None), suggestions)
+                choice = None
+                if title and lookup_engine.cache is not None:
+                    choice = lookup_engine.cache.get_selection(title)
+                    if choice is not None:
+                        metrics.count("remembered_selections")
+                if choice is None:
+                    suggestions = online_suggestions.get(entry_idx, [])
+
+                    suggestions = [s for s in suggestions if "journal" not in s or s["journal"] != "CoRR"]
+
+                    choice = get_online_selection(bib_dict["title"], bib_dict.get("author", ""), bib_dict.get("year", None), suggestions)
+                    if choice is not None and title and lookup_engine.cache is not None:
+                        lookup_engine.cache.set_selection(title, choice)
 
                 if choice is None:
                     output_bib_entries.append(_proc_arxiv(bib_dict, original_bibkey, original_title))
+                    _add_result(record, "not_found" if output_bib_entries[-1] is bib_dict else "arxiv")
                 else:
                     bib_entry = [f"@{choice['ENTRYTYPE']}{{{bib_dict['ID']},\n"]
                     for key, value in choice.items():
@@ -218,22 +519,140 @@ def normalize_bib(bib_db, all_bib_entries, output_bib_path, deduplicate=True, re
                         bib_entry += [f" {key} = {{{value}}},\n"]
                     bib_entry += ["}\n"]
 
-                    log_str = "Converted online entry. ID: %s ; Title: %s" % (
-                        original_bibkey,
-                        original_title,
-                    )
                     num_converted += 1
-                    print(log_str)
+                    metrics.count("online_conversions")
+                    logger.debug("Converted online entry. ID: %s ; Title: %s", original_bibkey, original_title)
+                    _add_result(record, "online")
                     output_bib_entries.append(bib_entry)
             else:
                 output_bib_entries.append(_proc_arxiv(bib_dict, original_bibkey, original_title))
+                _add_result(record, "not_found" if output_bib_entries[-1] is bib_dict else "arxiv")
+        if manifest is not None and len(output_bib_entries) > num_output_entries:
+            manifest.set(record, output_bib_entries[-1], num_converted - num_converted_before)
                 
-    print("Num of converted items:", num_converted)
+    metrics.add_time("matching", time.perf_counter() - start_time)
+    if manifest is not None:
+        logger.info("Unchanged entries: %d", manifest.hits)
+    logger.info("Num of converted items: %d", num_converted)
+    return output_bib_entries, num_converted
+
+def normalize_bib_entries(bib_db, all_bib_entries, deduplicate=True, removed_value_names=[], abbr_dict=[],
+                          sort=False, use_lookup_services: bool = False, lookup_engine=None, fuzzy_index=None,
+                          fuzzy_threshold=None, arxiv_index=None, manifest=None, results=None) -> Tuple[str, int]:
+    """Return the normalized BibTeX text and the number of converted entries."""
+    output_bib_entries, num_converted = match_bib_entries(bib_db, all_bib_entries, deduplicate, use_lookup_services,
+                                                          lookup_engine, fuzzy_index, fuzzy_threshold, arxiv_index,
+                                                          manifest, results)
     # post-formatting
-    output_string = post_processing(output_bib_entries, removed_value_names, abbr_dict, sort)
-    with open(output_bib_path, "w", encoding='utf8') as output_file:
+    with metrics.timer("post_processing"):
+        output_string = post_processing(output_bib_entries, removed_value_names, abbr_dict, sort)
+    if manifest is not None:
+        manifest.add_output(output_string)
+    return output_string, num_converted
+
+def normalize_bib(bib_db, all_bib_entries, output_bib_path, deduplicate=True, removed_value_names=[], abbr_dict=[],
+                  sort=False, use_lookup_services: bool = False, lookup_engine=None, fuzzy_index=None, fuzzy_threshold=None,
+                  arxiv_index=None, manifest=None):
+    output_string, _ = normalize_bib_entries(bib_db, all_bib_entries, deduplicate, removed_value_names, abbr_dict, sort,
+                                             use_lookup_services, lookup_engine, fuzzy_index, fuzzy_threshold, arxiv_index,
+                                             manifest)
+    with metrics.timer("write"), open(output_bib_path, "w", encoding='utf8') as output_file:
+        output_file.write(output_string)
+    logger.info("Written to: %s", output_bib_path)
+    if manifest is not None:
+        manifest.save()
+
+def _glob_base(pattern):
+    parts = []
+    for part in pattern.replace(os.sep, "/").split("/"):
+        if any(c in part for c in "*?["):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+def find_input_bibs(inputs):
+    """Expand the -i arguments (files, globs, and directories) into (path, relative output path) pairs."""
+    input_bibs = []
+    seen = set()
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            paths = sorted(glob.glob(os.path.join(pattern, "**", "*.bib"), recursive=True))
+            base = pattern
+        elif any(c in pattern for c in "*?["):
+            paths = sorted(glob.glob(pattern, recursive=True))
+            base = _glob_base(pattern)
+        else:
+            paths = [pattern]
+            base = os.path.dirname(pattern)
+        for path in paths:
+            if os.path.abspath(path) not in seen:
+                seen.add(os.path.abspath(path))
+                input_bibs.append((path, os.path.relpath(path, base or ".")))
+    return input_bibs
+
+# set before the worker processes are forked, so that they share the loaded bib data
+_batch_state = {}
+
+def _normalize_bib_file(input_path, output_path):
+    with metrics.timer("input_parse"):
+        all_bib_entries = load_bib_records(input_path)
+    manifest = None
+    if _batch_state["manifest_options"] is not None:
+        manifest = EntryManifest(manifest_path_for(input_path), _batch_state["manifest_options"])
+    output_string, num_converted = normalize_bib_entries(_batch_state["bib_db"], all_bib_entries, manifest=manifest,
+                                                         **_batch_state["options"])
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with metrics.timer("write"), open(output_path, "w", encoding='utf8') as output_file:
         output_file.write(output_string)
-    print("Written to:", output_bib_path)
+    logger.info("Written to: %s", output_path)
+    if manifest is not None:
+        manifest.save()
+    return sum(1 for record in all_bib_entries if record.fields is not None), num_converted
+
+def _normalize_bib_file_in_worker(input_path, output_path):
+    # the metrics of a worker process are sent back with each file
+    metrics.reset()
+    return _normalize_bib_file(input_path, output_path), metrics.to_dict()
+
+def normalize_bib_files(bib_db, input_output_paths, jobs=None, manifest_options=None, **options):
+    """Normalize many files with the same bib data and options; return the number of files that failed.
+
+    With more than one job, the files are distributed over forked worker
+    processes, which share the bib data of this process copy-on-write.
+    With manifest_options, each input file gets an EntryManifest sidecar.
+    """
+    _batch_state["bib_db"] = bib_db
+    _batch_state["options"] = options
+    _batch_state["manifest_options"] = manifest_options
+    jobs = jobs or os.cpu_count() or 1
+    if options.get("use_lookup_services") or "fork" not in multiprocessing.get_all_start_methods():
+        jobs = 1
+    start_time = time.time()
+    results = {}
+    if jobs == 1 or len(input_output_paths) == 1:
+        for input_path, output_path in input_output_paths:
+            try:
+                results[input_path] = _normalize_bib_file(input_path, output_path)
+            except Exception as e:
+                logger.error("Failed: %s %r", input_path, e)
+    else:
+        with multiprocessing.get_context("fork").Pool(min(jobs, len(input_output_paths))) as pool:
+            pending = [(input_path, pool.apply_async(_normalize_bib_file_in_worker, (input_path, output_path)))
+                       for input_path, output_path in input_output_paths]
+            for input_path, result in pending:
+                try:
+                    results[input_path], worker_metrics = result.get()
+                    metrics.merge(worker_metrics)
+                except Exception as e:
+                    logger.error("Failed: %s %r", input_path, e)
+    num_failed = len(input_output_paths) - len(results)
+    metrics.count("files", len(input_output_paths))
+    metrics.count("failed_files", num_failed)
+    logger.info("Files: %d ; Failed: %d ; Entries: %d ; Converted: %d ; Time: %.2fs",
+                len(input_output_paths), num_failed, sum(n for n, _ in results.values()),
+                sum(n for _, n in results.values()), time.time() - start_time)
+    return num_failed
 
 def load_abbr_tsv(abbr_tsv_file):
     abbr_dict = []
@@ -242,28 +661,110 @@ def load_abbr_tsv(abbr_tsv_file):
             ls = line.split("|")
             if len(ls) == 2:
                 abbr_dict.append((ls[0].strip(), ls[1].strip())) 
-    return abbr_dict
+    return AbbrMatcher(abbr_dict)
 
-def update(filepath):
+def update_from_zip(filepath):
     def execute(cmd):
-        print(cmd)
+        logger.info(cmd)
         os.system(cmd)
     execute("wget https://github.com/yuchenlin/rebiber/archive/main.zip -O /tmp/rebiber.zip")
     execute("unzip -o /tmp/rebiber.zip -d /tmp/")
     execute(f"cp /tmp/rebiber-main/rebiber/bib_list.txt {filepath}/bib_list.txt")
     execute(f"cp /tmp/rebiber-main/rebiber/abbr.tsv {filepath}/abbr.tsv")
     execute(f"cp /tmp/rebiber-main/rebiber/data/* {filepath}/data/")
-    print("Done Updating.")
+
+def update(filepath, source=None):
+    """Download the bib data files that changed, as listed in the data manifest at source."""
+    source = source or os.environ.get("REBIBER_UPDATE_SOURCE", DEFAULT_UPDATE_SOURCE)
+    bib_list_file = filepath + "bib_list.txt"
+    logger.info("Updating from: %s", source)
+    try:
+        manifest = fetch_data_manifest(source)
+    except (OSError, ValueError) as e:
+        # only the default source may predate the data manifest
+        if source != DEFAULT_UPDATE_SOURCE or not is_not_found(e):
+            logger.error("Update failed: %s", e)
+            raise SystemExit(1)
+        logger.info("No data manifest at %s, downloading the whole repository.", source)
+        update_from_zip(filepath)
+        num_downloaded, num_unchanged, num_removed = 1, 0, 0
+    else:
+        try:
+            num_downloaded, num_unchanged, num_removed = update_data(bib_list_file, source, manifest)
+        except (OSError, ValueError) as e:
+            logger.error("Update failed: %s", e)
+            raise SystemExit(1)
+        logger.info("Downloaded: %d Unchanged: %d Removed: %d", num_downloaded, num_unchanged, num_removed)
+    if num_downloaded or num_removed:
+        # the db cache, shard map and fuzzy index notice the change by themselves
+        if os.path.exists(index_path_for(bib_list_file)):
+            build_index(bib_list_file, start_dir=filepath)
+        else:
+            update_arxiv_index(bib_list_file)
+    logger.info("Done Updating.")
+
+def incremental_options(args, removed_value_names, start_dir=""):
+    """Everything the normalized entries depend on, to invalidate the sidecars of --incremental."""
+    return {"rebiber": rebiber.__version__, "bib_data": bib_list_fingerprint(args.bib_list, start_dir),
+            "abbr": file_sha256(args.abbr_tsv) if args.shorten else None, "deduplicate": bool(args.deduplicate),
+            "remove": removed_value_names, "sort": bool(args.sort), "online": args.online,
+            "arxiv_index": not args.no_arxiv_index, "fuzzy": args.fuzzy}
+
+def normalize_with_server(server_url, args, output_path, removed_value_names, start_dir=""):
+    """Send the input to a running `rebiber serve` with the same data; return False if there is none."""
+    from rebiber.server import DEFAULT_URL, normalize_on_server, server_status
+    server_url = server_url or os.environ.get("REBIBER_SERVER", DEFAULT_URL)
+    status = server_status(server_url)
+    if status is None or status.get("bib_list") != os.path.abspath(args.bib_list):
+        return False
+    if status.get("version") != rebiber.__version__:
+        logger.info("The server at %s runs another version of rebiber, normalizing locally.", server_url)
+        return False
+    if status.get("fingerprint") != bib_list_fingerprint(args.bib_list, start_dir):
+        logger.info("The server at %s has other bib data, normalizing locally.", server_url)
+        return False
+    if args.shorten and status.get("abbr_tsv") != os.path.abspath(args.abbr_tsv):
+        return False
+    with open(args.input_bib[0], encoding='utf8') as f:
+        bib = f.read()
+    try:
+        result = normalize_on_server(server_url, bib, remove=removed_value_names, shorten=bool(args.shorten),
+                                     sort=bool(args.sort), deduplicate=bool(args.deduplicate),
+                                     arxiv_index=not args.no_arxiv_index, fuzzy=args.fuzzy)
+    except (OSError, RuntimeError, ValueError) as e:
+        logger.warning("Server failed, normalizing locally: %s", e)
+        return False
+    logger.info("Normalized by server: %s", server_url)
+    logger.info("Num of converted items: %d", result["num_converted"])
+    with metrics.timer("write"), open(output_path, "w", encoding='utf8') as output_file:
+        output_file.write(result["bib"])
+    logger.info("Written to: %s", output_path)
+    return True
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from rebiber.server import main as serve
+        serve(sys.argv[2:])
+        return
     filepath = os.path.dirname(os.path.abspath(__file__)) + '/'
     parser = argparse.ArgumentParser()
     parser.add_argument("-u", "--update", action='store_true', help="Update the data of bib and abbr.")
+    parser.add_argument("--update_source", default=None,
+                        type=str, help="Where --update gets the data from: a URL or a local folder with a data_manifest.json "
+                                       "(default: $REBIBER_UPDATE_SOURCE or the rebiber repository on GitHub).")
     parser.add_argument("-v", "--version", action='store_true', help="Print the version of Rebiber.")
-    parser.add_argument("-i", "--input_bib",
-                        type=str, help="The input bib file")
+    parser.add_argument("-b", "--build_index", action='store_true',
+                        help="Compile the bib data in --bib_list into a single memory-mapped index file.")
+    parser.add_argument("-z", "--lazy", action='store_true',
+                        help="Only load the bib data files that contain the titles in the input.")
+    parser.add_argument("-nc", "--no_cache", action='store_true',
+                        help="Do not read or write the caches of the compiled database and online lookups in ~/.cache/rebiber.")
+    parser.add_argument("-i", "--input_bib", nargs="+",
+                        type=str, help="The input bib file, or several files, globs (e.g. 'papers/**/*.bib') and folders")
     parser.add_argument("-o", "--output_bib", default="same",
-                        type=str, help="The output bib file")
+                        type=str, help="The output bib file (the output folder for several input files)")
+    parser.add_argument("-j", "--jobs", default=None,
+                        type=int, help="The number of worker processes for several input files (default: number of CPUs).")
     parser.add_argument("-l", "--bib_list", default=filepath+"bib_list.txt",
                         type=str, help="The list of candidate bib data.")
     parser.add_argument("-a", "--abbr_tsv", default=filepath+"abbr.tsv",
@@ -278,27 +779,102 @@ def main():
                         type=bool, help="True to sort the output BibTeX entries alphabetically by ID")
     parser.add_argument("-ol", "--online", action="store_true",
                         help="True to use online resources to look for missing BibTeX entries in a semi-automated way.")
+    parser.add_argument("-nx", "--no_arxiv_index", action='store_true',
+                        help="Do not resolve arXiv entries to their published version by arXiv ID.")
+    parser.add_argument("-f", "--fuzzy", default=None, type=float, metavar="THRESHOLD",
+                        help="Also match titles that are not identical but at least this similar (0-1), e.g. '--fuzzy 0.9'.")
+    parser.add_argument("--server", nargs="?", const="", default=None, metavar="URL",
+                        type=str, help="Send the input to a running 'rebiber serve' at this address if it uses the same "
+                                       "--bib_list (default: $REBIBER_SERVER or http://127.0.0.1:8765). Setting "
+                                       "$REBIBER_SERVER also enables this.")
+    parser.add_argument("-inc", "--incremental", action='store_true',
+                        help="Keep a sidecar of the normalized entries next to each input file and only normalize new or changed entries.")
+    parser.add_argument("-ns", "--no_server", action='store_true',
+                        help="Always load the bib data locally, even if $REBIBER_SERVER is set.")
+    parser.add_argument("--log_level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        type=str.upper, help="The level of the log messages; DEBUG also logs every converted entry.")
+    parser.add_argument("--profile", action='store_true',
+                        help="Print the time spent in each stage and counters such as database hits at the end.")
+    parser.add_argument("--metrics_json", "--metrics-json", default=None,
+                        type=str, help="Write the stage timers and counters to this JSON file at the end.")
     args = parser.parse_args()
-
-
+    logging.basicConfig(level=args.log_level, format="%(message)s", stream=sys.stdout)
+    try:
+        run(args, filepath)
+    finally:
+        if args.profile:
+            print(metrics.report())
+        if args.metrics_json:
+            with open(args.metrics_json, "w") as f:
+                json.dump(metrics.to_dict(), f, indent=2)
+
+def run(args, filepath):
     if args.update:
-        update(filepath)
+        update(filepath, args.update_source)
         return
     if args.version:
         print(rebiber.__version__)
         return
+    if args.build_index:
+        build_index(args.bib_list, start_dir=filepath)
+        if args.input_bib is None:
+            return
 
 
     assert args.input_bib is not None, "You need to specify an input path by -i xxx.bib"
-    bib_db = construct_bib_db(args.bib_list, start_dir=filepath)
-    all_bib_entries = load_bib_file(args.input_bib)
-    output_path = args.input_bib if args.output_bib == "same" else args.output_bib
+    is_batch = len(args.input_bib) > 1 or any(os.path.isdir(p) or any(c in p for c in "*?[") for p in args.input_bib)
     removed_value_names = [s.strip() for s in args.remove.split(",")]
+    if is_batch:
+        input_bibs = find_input_bibs(args.input_bib)
+        assert input_bibs, "No bib files found in: " + " ".join(args.input_bib)
+        if args.output_bib == "same":
+            input_output_paths = [(path, path) for path, _ in input_bibs]
+        else:
+            input_output_paths = [(path, os.path.join(args.output_bib, relative_path)) for path, relative_path in input_bibs]
+        assert len(set(output_path for _, output_path in input_output_paths)) == len(input_output_paths), \
+            "Several input files would be written to the same output file."
+    else:
+        output_path = args.input_bib[0] if args.output_bib == "same" else args.output_bib
+        # only on request: any local user could answer on the server port
+        use_server = not args.no_server and (args.server is not None or "REBIBER_SERVER" in os.environ)
+        if use_server and not args.online and not args.incremental and \
+                normalize_with_server(args.server, args, output_path, removed_value_names, filepath):
+            return
+    manifest_options = incremental_options(args, removed_value_names, filepath) if args.incremental else None
+    needs_bib_data = True
+    if manifest_options is not None:
+        input_paths = [path for path, _ in input_output_paths] if is_batch else args.input_bib[:1]
+        needs_bib_data = not all(EntryManifest(manifest_path_for(path), manifest_options).covers(load_bib_records(path))
+                                 for path in input_paths)
+    if needs_bib_data:
+        with metrics.timer("db_load"):
+            bib_db = construct_bib_db(args.bib_list, start_dir=filepath, lazy=args.lazy, use_cache=not args.no_cache)
+    else:
+        logger.info("All entries are unchanged, not loading the bib data.")
+        bib_db = {}
     if args.shorten:
         abbr_dict = load_abbr_tsv(args.abbr_tsv)
     else:
         abbr_dict = []
-    normalize_bib(bib_db, all_bib_entries, output_path, args.deduplicate, removed_value_names, abbr_dict, args.sort, args.online)
+    lookup_engine = default_lookup_engine(use_cache=not args.no_cache) if args.online else None
+    fuzzy_index, arxiv_index = None, None
+    if needs_bib_data and args.fuzzy is not None:
+        fuzzy_index = load_fuzzy_index(args.bib_list, start_dir=filepath, bib_db=bib_db)
+    if needs_bib_data and not args.no_arxiv_index:
+        arxiv_index = load_arxiv_index(args.bib_list, start_dir=filepath, bib_db=bib_db)
+    if is_batch:
+        num_failed = normalize_bib_files(bib_db, input_output_paths, args.jobs, manifest_options, deduplicate=args.deduplicate,
+                                         removed_value_names=removed_value_names, abbr_dict=abbr_dict, sort=args.sort,
+                                         use_lookup_services=args.online, lookup_engine=lookup_engine,
+                                         fuzzy_index=fuzzy_index, fuzzy_threshold=args.fuzzy, arxiv_index=arxiv_index)
+        if num_failed:
+            raise SystemExit(1)
+        return
+    with metrics.timer("input_parse"):
+        all_bib_entries = load_bib_records(args.input_bib[0])
+    manifest = EntryManifest(manifest_path_for(args.input_bib[0]), manifest_options) if args.incremental else None
+    normalize_bib(bib_db, all_bib_entries, output_path, args.deduplicate, removed_value_names, abbr_dict, args.sort, args.online,
+                  lookup_engine, fuzzy_index, args.fuzzy, arxiv_index, manifest)
 
 
 if __name__ == "__main__":
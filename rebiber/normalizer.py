@@ -0,0 +1,73 @@
+import os
+from typing import Iterable, List, Tuple
+
+from rebiber.abbr_matcher import AbbrMatcher
+from rebiber.bib2json import iter_bib_records
+from rebiber.metrics import metrics
+from rebiber.normalize import (EntryResult, construct_bib_db, load_abbr_tsv, load_arxiv_index, load_fuzzy_index,
+                               normalize_bib_entries)
+
+filepath = os.path.dirname(os.path.abspath(__file__)) + '/'
+
+OPTIONS = ("deduplicate", "removed_value_names", "shorten", "sort", "arxiv_index", "fuzzy_index", "fuzzy_threshold")
+
+
+class Normalizer:
+    """Normalizes BibTeX text with a bib database that is loaded once.
+
+    Nothing is printed or written to files, and the database, indexes and
+    options are only read, so one instance can be shared by many threads.
+    ``with_options`` returns a copy with other options that shares the loaded
+    data. Online lookups (which ask the user) and incremental sidecars are
+    only available on the command line.
+    """
+
+    def __init__(self, bib_db, abbr_dict=(), deduplicate=True, removed_value_names=(), shorten=False, sort=False,
+                 arxiv_index=None, fuzzy_index=None, fuzzy_threshold=None):
+        self.bib_db = bib_db
+        self.abbr_matcher = abbr_dict if isinstance(abbr_dict, AbbrMatcher) else AbbrMatcher(abbr_dict)
+        self.deduplicate = deduplicate
+        self.removed_value_names = list(removed_value_names)
+        self.shorten = shorten
+        self.sort = sort
+        self.arxiv_index = arxiv_index
+        self.fuzzy_index = fuzzy_index
+        self.fuzzy_threshold = fuzzy_threshold
+        if fuzzy_threshold is not None and fuzzy_index is None:
+            raise ValueError("fuzzy_threshold needs a fuzzy_index.")
+
+    @classmethod
+    def from_files(cls, bib_list_file=filepath+"bib_list.txt", abbr_tsv_file=filepath+"abbr.tsv", start_dir=filepath,
+                   use_cache=True, use_arxiv_index=True, **options):
+        """Load the bib data, the abbreviations and the indexes the options need, as the command line does."""
+        with metrics.timer("db_load"):
+            bib_db = construct_bib_db(bib_list_file, start_dir=start_dir, use_cache=use_cache)
+        if use_arxiv_index:
+            options.setdefault("arxiv_index", load_arxiv_index(bib_list_file, start_dir=start_dir, bib_db=bib_db))
+        if options.get("fuzzy_threshold") is not None and options.get("fuzzy_index") is None:
+            options["fuzzy_index"] = load_fuzzy_index(bib_list_file, start_dir=start_dir, bib_db=bib_db)
+        return cls(bib_db, load_abbr_tsv(abbr_tsv_file), **options)
+
+    def with_options(self, **options) -> "Normalizer":
+        for name in options:
+            if name not in OPTIONS:
+                raise TypeError(f"Unknown option: {name}")
+        current = {name: getattr(self, name) for name in OPTIONS}
+        return type(self)(self.bib_db, self.abbr_matcher, **dict(current, **options))
+
+    def normalize(self, text: str) -> Tuple[str, List[EntryResult]]:
+        """Return the normalized BibTeX text and what happened to each entry of text."""
+        with metrics.timer("input_parse"):
+            records = list(iter_bib_records(text))
+        results = []
+        output_string, _ = normalize_bib_entries(
+            self.bib_db, records, deduplicate=self.deduplicate, removed_value_names=self.removed_value_names,
+            abbr_dict=self.abbr_matcher if self.shorten else [], sort=self.sort, fuzzy_index=self.fuzzy_index,
+            fuzzy_threshold=self.fuzzy_threshold, arxiv_index=self.arxiv_index, results=results)
+        return output_string, results
+
+    def normalize_many(self, texts: Iterable[str], executor=None) -> List[Tuple[str, List[EntryResult]]]:
+        """Normalize several texts, in order; with a concurrent.futures executor, on its workers."""
+        if executor is None:
+            return [self.normalize(text) for text in texts]
+        return list(executor.map(self.normalize, texts))
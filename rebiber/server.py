@@ -0,0 +1,179 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Dict, Optional
+
+import rebiber
+from rebiber.db_cache import bib_list_fingerprint
+from rebiber.metrics import metrics
+from rebiber.normalize import load_fuzzy_index
+from rebiber.normalizer import Normalizer
+
+filepath = os.path.dirname(os.path.abspath(__file__)) + '/'
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+
+logger = logging.getLogger(__name__)
+
+
+class NormalizationServer(ThreadingMixIn, HTTPServer):
+    """HTTP server that loads the bib database once and normalizes BibTeX text sent to it.
+
+    ``GET /status`` describes the loaded data; ``POST /normalize`` takes a JSON
+    object with the BibTeX text in ``bib`` and the options ``remove`` (list of
+    field names), ``shorten``, ``sort``, ``deduplicate``, ``arxiv_index`` and
+    ``fuzzy`` (threshold), and returns the normalized text in ``bib`` and what
+    happened to each input entry in ``entries``;
+    ``GET /metrics`` returns the counters and stage timers of all requests.
+    Requests are handled concurrently; the database is only read.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, bib_list_file, abbr_tsv_file, start_dir=filepath, use_cache=True):
+        self.bib_list_file = os.path.abspath(bib_list_file)
+        self.abbr_tsv_file = os.path.abspath(abbr_tsv_file)
+        self.start_dir = start_dir
+        # taken before loading, so data that changes meanwhile is seen as stale by clients
+        self.fingerprint = bib_list_fingerprint(bib_list_file, start_dir)
+        self.normalizer = Normalizer.from_files(bib_list_file, abbr_tsv_file, start_dir=start_dir, use_cache=use_cache)
+        self.started = time.time()
+        self.num_requests = 0
+        self._fuzzy_index = None
+        self._lock = threading.Lock()
+        super().__init__(address, NormalizationRequestHandler)
+
+    def fuzzy_index(self):
+        with self._lock:
+            if self._fuzzy_index is None:
+                self._fuzzy_index = load_fuzzy_index(self.bib_list_file, start_dir=self.start_dir,
+                                                     bib_db=self.normalizer.bib_db)
+            return self._fuzzy_index
+
+    def status(self) -> Dict:
+        return {"version": rebiber.__version__, "bib_list": self.bib_list_file, "abbr_tsv": self.abbr_tsv_file,
+                "fingerprint": self.fingerprint, "size": len(self.normalizer.bib_db),
+                "uptime": time.time() - self.started, "num_requests": self.num_requests}
+
+    def normalize(self, request: Dict) -> Dict:
+        bib = request.get("bib")
+        if not isinstance(bib, str):
+            raise ValueError("'bib' must be the BibTeX text to normalize.")
+        fuzzy_threshold = request.get("fuzzy")
+        normalizer = self.normalizer.with_options(
+            deduplicate=request.get("deduplicate", True),
+            removed_value_names=request.get("remove", []),
+            shorten=request.get("shorten", False),
+            sort=request.get("sort", False),
+            fuzzy_index=self.fuzzy_index() if fuzzy_threshold is not None else None,
+            fuzzy_threshold=fuzzy_threshold,
+            arxiv_index=self.normalizer.arxiv_index if request.get("arxiv_index", True) else None)
+        output_string, results = normalizer.normalize(bib)
+        with self._lock:
+            self.num_requests += 1
+        return {"bib": output_string, "num_converted": sum(result.converted for result in results),
+                "entries": [result._asdict() for result in results]}
+
+
+class NormalizationRequestHandler(BaseHTTPRequestHandler):
+
+    def _send_json(self, code, obj):
+        body = json.dumps(obj).encode("utf8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send_json(200, self.server.status())
+        elif self.path == "/metrics":
+            self._send_json(200, metrics.to_dict())
+        else:
+            self._send_json(404, {"error": "Unknown path: " + self.path})
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def do_POST(self):
+        if self.path != "/normalize":
+            self._send_json(404, {"error": "Unknown path: " + self.path})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length).decode("utf8"))
+            if not isinstance(request, dict):
+                raise ValueError("The request must be a JSON object.")
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        try:
+            response = self.server.normalize(request)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": repr(e)})
+            return
+        self._send_json(200, response)
+
+
+def server_status(url=DEFAULT_URL, timeout=0.5) -> Optional[Dict]:
+    """Return the status of the server at url, or None if no server is running there."""
+    try:
+        with urllib.request.urlopen(url + "/status", timeout=timeout) as response:
+            return json.loads(response.read().decode("utf8"))
+    except (OSError, ValueError):
+        return None
+
+
+def normalize_on_server(url, bib, timeout=600, **options) -> Dict:
+    request = urllib.request.Request(url + "/normalize", data=json.dumps(dict(options, bib=bib)).encode("utf8"),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode("utf8"))
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(json.loads(e.read().decode("utf8")).get("error", str(e))) from e
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="rebiber serve",
+                                     description="Keep the bib database loaded and normalize BibTeX sent over HTTP.")
+    parser.add_argument("-l", "--bib_list", default=filepath+"bib_list.txt",
+                        type=str, help="The list of candidate bib data.")
+    parser.add_argument("-a", "--abbr_tsv", default=filepath+"abbr.tsv",
+                        type=str, help="The list of conference abbreviation data.")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        type=str, help="The address to listen on.")
+    parser.add_argument("-p", "--port", default=DEFAULT_PORT,
+                        type=int, help="The port to listen on.")
+    parser.add_argument("-nc", "--no_cache", action='store_true',
+                        help="Do not read or write the cache of the compiled database in ~/.cache/rebiber.")
+    parser.add_argument("--log_level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        type=str.upper, help="The level of the log messages.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level, format="%(message)s", stream=sys.stdout)
+    server = NormalizationServer((args.host, args.port), args.bib_list, args.abbr_tsv, use_cache=not args.no_cache)
+    logger.info("Serving on: http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
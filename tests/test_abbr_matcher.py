@@ -0,0 +1,70 @@
+import glob
+import json
+import os
+import re
+
+import pytest
+
+from rebiber.abbr_matcher import AbbrMatcher
+from rebiber.bib2json import parse_entry
+from rebiber.normalize import load_abbr_tsv
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rebiber")
+
+
+def shorten_sequentially(abbr_pairs, venue):
+    """The loop of post_processing before AbbrMatcher."""
+    for short, pattern in abbr_pairs:
+        if re.match(pattern, venue):
+            venue = short
+    return venue
+
+
+def corpus_venues():
+    """The booktitle and journal values of the newest data file of each venue."""
+    newest = {}
+    for path in sorted(glob.glob(os.path.join(PACKAGE_DIR, "data", "*.json"))):
+        newest[re.match(r"[a-z]+", os.path.basename(path)).group()] = path
+    venues = set()
+    for path in newest.values():
+        with open(path) as f:
+            bib_db = json.load(f)
+        for lines in bib_db.values():
+            record = parse_entry("".join(lines))
+            if record is not None:
+                venues.update(record.fields[place] for place in ("booktitle", "journal") if place in record.fields)
+    return sorted(venues)
+
+
+def test_abbr_tsv_on_corpus_venues():
+    abbr_matcher = load_abbr_tsv(os.path.join(PACKAGE_DIR, "abbr.tsv"))
+    venues = corpus_venues() + [
+        "Proceedings of the 58th Annual Meeting of the Association for Computational Linguistics",
+        "Proceedings of the 2020 Conference on Empirical Methods in Natural Language Processing",
+        "Proceedings of the 2019 Conference of the North {A}merican Chapter of the Association for "
+        "Computational Linguistics: Human Language Technologies",
+        "Proc. of ICLR",
+        "",
+    ]
+    assert any(abbr_matcher.shorten(venue) != venue for venue in venues)
+    for venue in venues:
+        assert abbr_matcher.shorten(venue) == shorten_sequentially(abbr_matcher, venue), venue
+        # remembered results
+        assert abbr_matcher.shorten(venue) == shorten_sequentially(abbr_matcher, venue), venue
+
+
+@pytest.mark.parametrize("abbr_pairs", [
+    # a later pair matches the short name of an earlier one
+    [("Long Venue", "Very Long Venue.*"), ("LV", "Long.*"), ("Other", "Other.*")],
+    # backreferences cannot be combined into one alternation
+    [("Double", r"(\w+) \1"), ("Word", r"\w+$")],
+    # a global flag that is not at the start of the alternation
+    [("Plain", "plain"), ("Any Case", "(?i)any case")],
+    [],
+])
+def test_shorten_matches_the_sequential_loop(abbr_pairs):
+    abbr_matcher = AbbrMatcher(abbr_pairs)
+    venues = ["Very Long Venue 2020", "Long Venue", "Other Venue", "again again", "again", "again twice",
+              "plain", "ANY CASE", "Plain", "", "Very Long Venue"]
+    for venue in venues:
+        assert abbr_matcher.shorten(venue) == shorten_sequentially(abbr_pairs, venue), venue
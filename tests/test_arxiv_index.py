@@ -0,0 +1,36 @@
+import json
+import os
+
+import rebiber.normalize
+from rebiber.arxiv_index import arxiv_index_path_for
+from rebiber.db_cache import cached_index_path_for
+from rebiber.normalize import load_arxiv_index
+
+BIB_DB = {
+    "publishedtitle": ["@inproceedings{a1,\n", "  ee = {https://arxiv.org/abs/2005.00683},\n", "}\n"],
+    "othertitle": ["@inproceedings{a2,\n", "}\n"],
+}
+
+
+def test_arxiv_index_falls_back_to_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    os.mkdir(tmp_path / "data")
+    with open(tmp_path / "data" / "a.json", "w") as f:
+        json.dump(BIB_DB, f)
+    bib_list = str(tmp_path / "bib_list.txt")
+    with open(bib_list, "w") as f:
+        f.write("data/a.json\n")
+    write_arxiv_index = rebiber.normalize.write_arxiv_index
+
+    def read_only(arxiv_index, index_path):
+        if index_path == arxiv_index_path_for(bib_list):
+            raise PermissionError(13, "Read-only file system", index_path)
+        write_arxiv_index(arxiv_index, index_path)
+
+    monkeypatch.setattr(rebiber.normalize, "write_arxiv_index", read_only)
+    start_dir = str(tmp_path) + "/"
+    assert load_arxiv_index(bib_list, start_dir, bib_db=BIB_DB) == {"2005.00683": "publishedtitle"}
+    assert os.path.exists(cached_index_path_for(bib_list, ".arxiv.json"))
+
+    # the cached index is used without the bib data
+    assert load_arxiv_index(bib_list, start_dir) == {"2005.00683": "publishedtitle"}
@@ -0,0 +1,62 @@
+import io
+
+import bibtexparser
+import pytest
+
+from rebiber.bib2json import iter_bib_records, parse_entry
+
+# Each input must give the same entries with iter_bib_records as with
+# bibtexparser, which rebiber used to parse the input before.
+INPUTS = {
+    "braced": "@inproceedings{a,\n  title = {Some {BERT} Title},\n  author = {A and B},\n}\n",
+    "quoted": '@article{a, title = "Quoted {Title}", journal = "J"}\n',
+    "integer_before_newline": "@article{a,\n title={T},\n year=2021\n}\n",
+    "integer_before_brace": "@article{a, title={T}, year=2021}\n",
+    "integer_before_comma": "@article{a, title={T}, year = 2021 , pages={1--2}}\n",
+    "tabs": "@article{a,\n\ttitle\t=\t{Tab\tSeparated},\n\tyear\t=\t2001\n}\n",
+    "multi_line_value": "@article{a,\n  title = {A title\n\t   over two lines},\n}\n",
+    "month_macro": "@article{a, title={T}, month = may, year = 2020}\n",
+    "string_macro": "@string{emnlp = {Proceedings of EMNLP}}\n"
+                    "@inproceedings{a, title={T}, booktitle = emnlp}\n",
+    "concatenation": '@string{conf = "Proceedings of "}\n'
+                     "@inproceedings{a, title={T}, booktitle = conf # {ACL} # \" 2020\"}\n",
+    "comment_block": "@comment{ignored, title={Not an entry}}\n@article{a, title={T}}\n",
+    "implicit_comment": "Some text before.\n@article{a, title={T}}\nand after\n@misc{b, title={U},}\n",
+    "preamble": '@preamble{"\\newcommand{\\noop}[1]{}"}\n@article{a, title={T}}\n',
+    "parentheses": "@article(a, title={T}, year=1999)\n",
+    "malformed_between": "@article{a, title={T}}\n@article{b, title={U}\n@article{c, title={V}}\n",
+}
+
+
+def bibtexparser_entries(text):
+    bibparser = bibtexparser.bparser.BibTexParser(ignore_nonstandard_types=False)
+    entries = bibtexparser.loads(text, bibparser).entries
+    return [(entry["ID"], entry["ENTRYTYPE"], {name: entry[name] for name in entry if name not in ("ID", "ENTRYTYPE")})
+            for entry in entries]
+
+
+def record_entries(records):
+    return [(record.key, record.type, record.fields) for record in records if record.fields is not None]
+
+
+@pytest.mark.parametrize("name", sorted(INPUTS))
+def test_iter_bib_records_matches_bibtexparser(name):
+    text = INPUTS[name]
+    assert record_entries(iter_bib_records(text)) == bibtexparser_entries(text)
+
+
+@pytest.mark.parametrize("name", sorted(INPUTS))
+def test_iter_bib_records_reads_file_objects_in_chunks(name):
+    text = INPUTS[name]
+    assert record_entries(iter_bib_records(io.StringIO(text), chunk_size=7)) == bibtexparser_entries(text)
+
+
+@pytest.mark.parametrize("name", ["braced", "quoted", "integer_before_newline", "integer_before_comma", "tabs"])
+def test_parse_entry_matches_bibtexparser(name):
+    text = INPUTS[name]
+    assert record_entries([parse_entry(text)]) == bibtexparser_entries(text)
+
+
+def test_parse_entry_leaves_macros_to_bibtexparser():
+    assert parse_entry(INPUTS["month_macro"]) is None
+    assert parse_entry(INPUTS["string_macro"]) is None
@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+import rebiber.bib_database
+from rebiber.bib_database import BibDatabase, shard_map_path_for
+from rebiber.db_cache import cached_index_path_for
+
+SHARDS = {
+    "data/a.json": {"firsttitle": ["@inproceedings{a1,\n", "}\n"], "sharedtitle": ["@inproceedings{a2,\n", "}\n"]},
+    "data/b.json": {"secondtitle": ["@article{b1,\n", "}\n"], "sharedtitle": ["@article{b2,\n", "}\n"]},
+}
+
+
+@pytest.fixture
+def bib_list(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    os.mkdir(tmp_path / "data")
+    for name, shard in SHARDS.items():
+        with open(tmp_path / name, "w") as f:
+            json.dump(shard, f)
+    with open(tmp_path / "bib_list.txt", "w") as f:
+        f.write("\n".join(SHARDS) + "\n")
+    return str(tmp_path / "bib_list.txt")
+
+
+def expected_db():
+    bib_db = {}
+    for shard in SHARDS.values():
+        bib_db.update(shard)
+    return bib_db
+
+
+def test_get_matches_the_merged_data(bib_list):
+    bib_db = BibDatabase(bib_list, os.path.dirname(bib_list) + "/")
+    for key, lines in expected_db().items():
+        assert bib_db.get(key) == lines
+    assert bib_db.get("missingtitle") is None
+
+
+def test_prefetch_loads_each_shard_once(bib_list):
+    bib_db = BibDatabase(bib_list, os.path.dirname(bib_list) + "/", max_resident_shards=1)
+    keys = ["firsttitle", "secondtitle", "sharedtitle", "missingtitle"] * 3
+    bib_db.prefetch(keys)
+    assert bib_db.num_shard_loads == 2
+    for key in keys:
+        assert bib_db.get(key) == expected_db().get(key)
+    assert bib_db.num_shard_loads == 2
+
+
+def test_shard_map_falls_back_to_the_cache(bib_list, monkeypatch):
+    write_shard_map = rebiber.bib_database.write_shard_map
+
+    def read_only(hashes, shard_ids, shard_map_path):
+        if shard_map_path == shard_map_path_for(bib_list):
+            raise PermissionError(13, "Read-only file system", shard_map_path)
+        write_shard_map(hashes, shard_ids, shard_map_path)
+
+    monkeypatch.setattr(rebiber.bib_database, "write_shard_map", read_only)
+    BibDatabase(bib_list, os.path.dirname(bib_list) + "/")
+    assert os.path.exists(cached_index_path_for(bib_list, ".shards"))
+
+    def no_build(bib_list_file, start_dir=""):
+        raise AssertionError("The cached shard map should be used.")
+
+    monkeypatch.setattr(rebiber.bib_database, "build_shard_map", no_build)
+    bib_db = BibDatabase(bib_list, os.path.dirname(bib_list) + "/")
+    assert bib_db.get("secondtitle") == SHARDS["data/b.json"]["secondtitle"]
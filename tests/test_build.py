@@ -0,0 +1,29 @@
+import os
+
+from rebiber.build import find_raw_bibs
+
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_find_raw_bibs(tmp_path):
+    raw_dir = str(tmp_path)
+    write(os.path.join(raw_dir, "aaai2018.bib"), "aaai2018\n")
+    write(os.path.join(raw_dir, "aaai2018-2.bib"), "aaai2018-2\n")
+    for part in (1, 2, 10):
+        write(os.path.join(raw_dir, "iclr2020_%d.bib" % part), "iclr2020 part %d\n" % part)
+    write(os.path.join(raw_dir, "cvpr2019.bib"), "cvpr2019\n")
+    write(os.path.join(raw_dir, "cvpr2019_1.bib"), "cvpr2019 part 1\n")
+
+    raw_bibs = find_raw_bibs(raw_dir)
+
+    assert raw_bibs == {name: os.path.join(raw_dir, name + ".bib")
+                        for name in ["aaai2018", "aaai2018-2", "iclr2020", "cvpr2019"]}
+    with open(raw_bibs["iclr2020"]) as f:
+        assert f.read() == "iclr2020 part 1\niclr2020 part 2\niclr2020 part 10\n"
+    with open(raw_bibs["cvpr2019"]) as f:
+        assert f.read() == "cvpr2019\n"
+    # the concatenated file is used from now on
+    assert find_raw_bibs(raw_dir) == raw_bibs
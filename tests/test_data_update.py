@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+import rebiber.normalize
+from rebiber.data_update import DATA_MANIFEST_NAME, update_data, write_data_manifest
+from rebiber.normalize import update
+
+
+def write_data(folder, shards, abbr="Proc. of X | Proceedings of X\n"):
+    os.makedirs(os.path.join(folder, "data"), exist_ok=True)
+    for name, shard in shards.items():
+        with open(os.path.join(folder, name), "w") as f:
+            json.dump(shard, f)
+    with open(os.path.join(folder, "bib_list.txt"), "w") as f:
+        f.write("".join(name + "\n" for name in shards))
+    with open(os.path.join(folder, "abbr.tsv"), "w") as f:
+        f.write(abbr)
+    write_data_manifest(os.path.join(folder, "bib_list.txt"))
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+@pytest.fixture
+def folders(tmp_path):
+    local, mirror = str(tmp_path / "local"), str(tmp_path / "mirror")
+    write_data(local, {"data/a.json": {"atitle": ["@article{a,\n", "}\n"]},
+                       "data/old.json": {"oldtitle": ["@article{old,\n", "}\n"]}})
+    write_data(mirror, {"data/a.json": {"atitle": ["@article{a,\n", "}\n"]},
+                        "data/b.json": {"btitle": ["@article{b,\n", "}\n"]}}, abbr="Proc. of Y | Proceedings of Y\n")
+    return local, mirror
+
+
+def test_update_from_a_local_mirror(folders):
+    local, mirror = folders
+    bib_list = os.path.join(local, "bib_list.txt")
+    # bib_list.txt, abbr.tsv and data/b.json changed, data/a.json did not, data/old.json is gone
+    assert update_data(bib_list, mirror) == (3, 1, 1)
+    for name in ["bib_list.txt", "abbr.tsv", "data/a.json", "data/b.json", DATA_MANIFEST_NAME]:
+        assert read(os.path.join(local, name)) == read(os.path.join(mirror, name)), name
+    assert not os.path.exists(os.path.join(local, "data", "old.json"))
+    assert update_data(bib_list, mirror) == (0, 4, 0)
+
+
+def test_update_only_falls_back_to_the_zip_without_a_manifest(folders, tmp_path, monkeypatch):
+    local, mirror = folders
+    zip_updates = []
+    monkeypatch.setattr(rebiber.normalize, "update_from_zip", zip_updates.append)
+    monkeypatch.setattr(rebiber.normalize, "DEFAULT_UPDATE_SOURCE", mirror)
+    # a manifest that lists a missing file is an error
+    os.remove(os.path.join(mirror, "data", "b.json"))
+    with pytest.raises(SystemExit):
+        update(local + "/", mirror)
+    assert read(os.path.join(local, "bib_list.txt")) == "data/a.json\ndata/old.json\n"
+    assert zip_updates == []
+
+    # only the default source is downloaded as a whole if it has no manifest
+    with pytest.raises(SystemExit):
+        update(local + "/", str(tmp_path / "other_mirror"))
+    assert zip_updates == []
+    os.remove(os.path.join(mirror, DATA_MANIFEST_NAME))
+    update(local + "/", mirror)
+    assert zip_updates == [local + "/"]
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+
+import pytest
+
+from rebiber.bib2json import iter_bib_records, normalize_title
+from rebiber.incremental import EntryManifest, manifest_path_for
+from rebiber.normalize import incremental_options, normalize_bib_entries
+
+
+def dblp_entry(key, title, booktitle):
+    return [f"@inproceedings{{{key},\n", "  author    = {Some Author},\n", f"  title     = {{{title}}},\n",
+            f"  booktitle = {{{booktitle}}},\n", "  year      = {2020},\n", "}\n"]
+
+
+def bib_db_for(booktitle):
+    titles = ["Learning Things Fast", "Learning Other Things", "Learning Everything"]
+    return {normalize_title(title): dblp_entry(f"DBLP:conf/x/{i}", title, booktitle) for i, title in enumerate(titles)}
+
+
+INPUT = """@article{fast,
+  title = {Learning Things Fast},
+  author = {Some Author},
+  journal = {arXiv preprint arXiv:2001.00001}
+}
+
+@article{unknown,
+  title = {Not in the Data},
+  author = {Another Author},
+  year = {2019}
+}
+"""
+EDITED_INPUT = INPUT.replace("{Not in the Data}", "{Learning Other Things}") + """
+@misc{everything,
+  title = {Learning Everything},
+  author = {Some Author}
+}
+"""
+
+
+@pytest.fixture
+def args(tmp_path, monkeypatch):
+    # the bib list refers to data/x.json
+    monkeypatch.chdir(tmp_path)
+    os.mkdir(tmp_path / "data")
+    with open(tmp_path / "data" / "x.json", "w") as f:
+        json.dump(bib_db_for("Proc. of X"), f)
+    with open(tmp_path / "bib_list.txt", "w") as f:
+        f.write("data/x.json\n")
+    return argparse.Namespace(bib_list=str(tmp_path / "bib_list.txt"), abbr_tsv=None, shorten=False,
+                              deduplicate=True, sort=False, online=False, no_arxiv_index=False, fuzzy=None)
+
+
+def normalize(bib_db, text, manifest=None, **options):
+    return normalize_bib_entries(bib_db, list(iter_bib_records(text)), manifest=manifest, **options)[0]
+
+
+def run_incremental(bib_db, text, path, options, **normalize_options):
+    manifest = EntryManifest(path, options)
+    output = normalize(bib_db, text, manifest, **normalize_options)
+    manifest.save()
+    return output, manifest.hits
+
+
+def test_incremental_run_matches_a_full_run(args, tmp_path):
+    bib_db = bib_db_for("Proc. of X")
+    options = incremental_options(args, [])
+    path = manifest_path_for(str(tmp_path / "paper.bib"))
+    output, hits = run_incremental(bib_db, INPUT, path, options)
+    assert output == normalize(bib_db, INPUT)
+    assert hits == 0
+
+    # one entry is edited and one added
+    output, hits = run_incremental(bib_db, EDITED_INPUT, path, options)
+    assert output == normalize(bib_db, EDITED_INPUT)
+    assert hits == 1
+
+    # the output of a run is recognized when it is normalized again, e.g. in place
+    output_again, hits = run_incremental(bib_db, output, path, options)
+    assert output_again == output
+    assert hits == 3
+
+
+def test_sidecar_is_invalidated_by_other_options(args, tmp_path):
+    bib_db = bib_db_for("Proc. of X")
+    path = manifest_path_for(str(tmp_path / "paper.bib"))
+    run_incremental(bib_db, INPUT, path, incremental_options(args, []))
+    records = list(iter_bib_records(INPUT))
+    assert EntryManifest(path, incremental_options(args, [])).covers(records)
+
+    for changes in [{"sort": True}, {"deduplicate": False}, {"fuzzy": 0.9}, {"no_arxiv_index": True}]:
+        assert not EntryManifest(path, incremental_options(argparse.Namespace(**{**vars(args), **changes}), [])) \
+            .covers(records), changes
+    assert not EntryManifest(path, incremental_options(args, ["url"])).covers(records)
+
+    output, hits = run_incremental(bib_db, INPUT, path, incremental_options(args, ["year"]),
+                                   removed_value_names=["year"])
+    assert output == normalize(bib_db, INPUT, removed_value_names=["year"])
+    assert hits == 0
+
+
+def test_sidecar_is_invalidated_by_other_bib_data(args, tmp_path):
+    path = manifest_path_for(str(tmp_path / "paper.bib"))
+    run_incremental(bib_db_for("Proc. of X"), INPUT, path, incremental_options(args, []))
+
+    new_bib_db = bib_db_for("Proceedings of the X Conference")
+    with open(tmp_path / "data" / "x.json", "w") as f:
+        json.dump(new_bib_db, f)
+    output, hits = run_incremental(new_bib_db, INPUT, path, incremental_options(args, []))
+    assert output == normalize(new_bib_db, INPUT)
+    assert "Proceedings of the X Conference" in output
+    assert hits == 0
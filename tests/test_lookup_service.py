@@ -0,0 +1,94 @@
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from rebiber.lookup_cache import LookupCache
+from rebiber.lookup_service import CrossrefLookupService, DBLPLookupService, LookupEngine, make_session
+
+DBLP_BIBTEX = """@inproceedings{DBLP:conf/x/A20,
+  title = {A Title},
+  author = {A Author},
+  year = {2020}
+}
+"""
+CROSSREF_BIBTEX = "@article{good, title = {A Title}, doi = {10.1/good}, year = {2020}}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers like DBLP and Crossref; the BibTeX of the DOI 10.1/bad always fails."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        path = urllib.parse.urlparse(self.path).path
+        if path == "/search/publ/api":
+            self._send(200, DBLP_BIBTEX)
+        elif path == "/v1/works":
+            items = [{"DOI": "10.1/good"}, {"DOI": "10.1/bad"}, {"DOI": "10.1/good"}]
+            self._send(200, json.dumps({"message": {"items": items}}))
+        elif path == "/v1/works/10.1%2Fgood/transform":
+            self._send(200, CROSSREF_BIBTEX)
+        else:
+            self._send(503, "unavailable")
+
+    def _send(self, status, body):
+        body = body.encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.paths = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_url(server):
+    return "http://127.0.0.1:%d" % server.server_address[1]
+
+
+def crossref(server, **kwargs):
+    return CrossrefLookupService(base_url=stub_url(server), session=make_session(max_retries=1),
+                                 max_requests_per_second=0, **kwargs)
+
+
+def test_crossref_keeps_the_dois_that_resolve(stub_server):
+    with pytest.warns(UserWarning, match="503"):
+        suggestions = crossref(stub_server).get_suggestions({"title": "A Title"}, 3)
+    assert [suggestion["ID"] for suggestion in suggestions] == ["good"]
+    # the failing DOI is retried once
+    assert stub_server.paths.count("/v1/works/10.1%2Fbad/transform") == 2
+
+
+def test_lookup_engine_prefetches_all_services(stub_server):
+    dblp = DBLPLookupService(base_url=stub_url(stub_server), session=make_session(max_retries=0),
+                             max_requests_per_second=0)
+    engine = LookupEngine([dblp, crossref(stub_server)])
+    with pytest.warns(UserWarning):
+        suggestions = engine.prefetch([{"title": "A Title"}, {"title": "B Title"}], 3)
+    assert [[suggestion["ID"] for suggestion in entry] for entry in suggestions] == \
+        [["DBLP:conf/x/A20", "good"], ["DBLP:conf/x/A20", "good"]]
+
+
+def test_successful_responses_are_cached(stub_server, tmp_path):
+    cache = LookupCache(str(tmp_path / "lookup.sqlite"))
+    with pytest.warns(UserWarning):
+        first = crossref(stub_server, cache=cache).get_suggestions({"title": "A Title"}, 3)
+    num_requests = len(stub_server.paths)
+    with pytest.warns(UserWarning):
+        second = crossref(stub_server, cache=cache).get_suggestions({"title": "A Title"}, 3)
+    assert second == first
+    # only the failed DOI is asked again
+    assert stub_server.paths[num_requests:] == ["/v1/works/10.1%2Fbad/transform"] * 2
@@ -0,0 +1,49 @@
+import json
+import os
+
+import pytest
+
+import rebiber.normalize
+from rebiber.bib2json import iter_bib_records
+from rebiber.normalize import load_abbr_tsv, match_bib_entries, post_processing, read_output_entries
+
+filepath = os.path.dirname(os.path.abspath(rebiber.normalize.__file__)) + '/'
+
+# enough of the bib data for a part of the example input to be converted
+DATA_FILES = ["iclr2020", "aaai2019", "aaai2020", "nips2019", "cvpr2019"]
+
+OPTIONS = {
+    "default": dict(removed_value_names=[], shorten=False, sort=False),
+    "shorten": dict(removed_value_names=[], shorten=True, sort=False),
+    "sort": dict(removed_value_names=[], shorten=False, sort=True),
+    "remove": dict(removed_value_names=["url", "pages", "publisher"], shorten=False, sort=False),
+    "all": dict(removed_value_names=["url", "doi"], shorten=True, sort=True),
+}
+
+
+@pytest.fixture(scope="module")
+def output_bib_entries():
+    bib_db = {}
+    for name in DATA_FILES:
+        with open(filepath + "data/%s.bib.json" % name) as f:
+            bib_db.update(json.load(f))
+    with open(filepath + "example_input.bib", encoding="utf8") as f:
+        records = list(iter_bib_records(f))
+    output_bib_entries, num_converted = match_bib_entries(bib_db, records)
+    assert num_converted > 0
+    # entries found nowhere are left as dicts, which both writers read as comments;
+    # keep only a few, as with more than five of them the output is not rewritten at all
+    unconverted = [i for i, entry in enumerate(output_bib_entries) if isinstance(entry, dict)]
+    return [entry for i, entry in enumerate(output_bib_entries) if i not in unconverted[3:]]
+
+
+@pytest.mark.parametrize("name", sorted(OPTIONS))
+def test_direct_writer_matches_bibtexparser(output_bib_entries, monkeypatch, name):
+    options = OPTIONS[name]
+    abbr_dict = load_abbr_tsv(filepath + "abbr.tsv") if options["shorten"] else []
+    assert read_output_entries(output_bib_entries) is not None
+    assert len(read_output_entries(output_bib_entries)[0]) >= len(output_bib_entries) - 5
+    direct = post_processing(output_bib_entries, options["removed_value_names"], abbr_dict, options["sort"])
+    monkeypatch.setattr(rebiber.normalize, "read_output_entries", lambda output_bib_entries: None)
+    expected = post_processing(output_bib_entries, options["removed_value_names"], abbr_dict, options["sort"])
+    assert direct == expected